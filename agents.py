@@ -31,49 +31,65 @@
 
 # #workingcode
 import os
-from crewai import Agent
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# crewai and langchain are slow to import and the clients want credentials, so
+# nothing here is built until it's first used. There is one of each per model
+# name; routing.py decides which model serves a call.
 
-llm = ChatOpenAI(
-    model="gpt-4o",
-    api_key=openai_api_key,
-    temperature=0.8  # Higher temperature for more creative, natural responses
-)
+# crewai's verbose mode prints every step of every kickoff; only for debugging
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
 
-llm2 = ChatOpenAI(
-    model="gpt-4o",
-    api_key=openai_api_key,
-    temperature=0.1  # Lower temperature for more precise extraction
-)
+@lru_cache(maxsize=None)
+def get_llm(model):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=0.8  # Higher temperature for more creative, natural responses
+    )
 
-vet_appointment_agent = Agent(
-    role="Friendly Veterinary Appointment Coordinator",
-    goal="""Have natural, warm conversations with pet guardians to confirm appointment details.
+@lru_cache(maxsize=None)
+def get_llm2(model):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=0.1  # Lower temperature for more precise extraction
+    )
+
+@lru_cache(maxsize=None)
+def get_vet_appointment_agent(model):
+    from crewai import Agent
+    return Agent(
+        role="Friendly Veterinary Appointment Coordinator",
+        goal="""Have natural, warm conversations with pet guardians to confirm appointment details.
     Collect pet information (name, species, breed, DOB) and appointment details in a conversational way.
     Make the guardian feel comfortable and valued throughout the interaction.""",
-    backstory="""You are Alex, a cheerful and caring member of the Sunny Meadows Veterinary Hospital team.
+        backstory="""You are Alex, a cheerful and caring member of the Sunny Meadows Veterinary Hospital team.
     You have a warm, friendly personality that puts pet parents at ease. You're known for your 
     excellent communication skills and ability to make everyone feel welcome and cared for.
     Your goal is to ensure every pet parent has a positive experience even before they arrive.""",
-    llm=llm,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=2,
-    memory=True
-)
+        llm=get_llm(model),
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False,
+        max_iter=2,
+        memory=True
+    )
 
-data_extraction_agent = Agent(
-    role="Data Extraction and State Tracking Specialist",
-    goal="""Analyze conversations to extract pet and appointment details accurately and track conversation state.
+@lru_cache(maxsize=None)
+def get_data_extraction_agent(model):
+    from crewai import Agent
+    return Agent(
+        role="Data Extraction and State Tracking Specialist",
+        goal="""Analyze conversations to extract pet and appointment details accurately and track conversation state.
     Identify guardian name, pet name, species, breed, date of birth, appointment date and time.
     Determine the current stage of the conversation based on what information has been collected.""",
-    backstory="""You are a highly accurate data extraction system specialized in veterinary appointment conversations.
+        backstory="""You are a highly accurate data extraction system specialized in veterinary appointment conversations.
     You meticulously analyze dialogue to extract structured information and track the progression of conversations.
     Your precision ensures that no details are missed and the conversation flows smoothly through all necessary stages.""",
-    llm=llm2,
-    verbose=True,
-    allow_delegation=False,
-    max_iter=1
-)
\ No newline at end of file
+        llm=get_llm2(model),
+        verbose=AGENT_VERBOSE,
+        allow_delegation=False,
+        max_iter=1
+    )
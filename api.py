@@ -1,122 +1,735 @@
-from fastapi import FastAPI, Form, Request, Response
+from fastapi import FastAPI, APIRouter, Form, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
 from twilio.twiml.voice_response import VoiceResponse, Gather
-from twilio.rest import Client
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
-from crewai import Crew, Process
+import time
+import asyncio
 
-from agents import vet_appointment_agent
-from tasks import confirmation_task
+from agents import get_vet_appointment_agent
+from tasks import CONFIRMATION_TASK
 from manager import conversation_manager
+from workers import llm_pool, twilio_pool, tts_pool, store_pool, PoolSaturatedError
+from completions import complete, build_messages, openai_client
+from streaming import stream_reply, split_first_sentence
+from metrics import LatencyRecorder, spans
+from events import format_sse, TERMINAL_STATUSES
+from call_status import CallStatusCache
+from campaigns import CampaignDispatcher
+from roster import open_roster
+from responses import ResponseCache, last_sentence, fixed_lines
+from audio import AudioCache, create_synthesizer
+from routing import model_router
+from idempotency import WebhookDeduplicator, delivery_key
+from speculation import Speculator, predict_answers, placeholder
+from extraction import infer_stage
+from store import shared_store_configured
 
 load_dotenv()
 
-app = FastAPI()
+router = APIRouter()
 
 account_sid = os.getenv("TWILIO_ACCOUNT_SID")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 twilio_number = os.getenv("TWILIO_PHONE_NUMBER")
 ngrok_base_url = os.getenv("NGROK_BASE_URL")
 
-client = Client(account_sid, auth_token)
+@lru_cache(maxsize=None)
+def get_twilio_client():
+    # twilio.rest is a heavy import; only pay for it once a call is placed
+    from twilio.rest import Client
+    return Client(account_sid, auth_token)
 
-@app.post("/start-call")
+@lru_cache(maxsize=None)
+def get_roster():
+    # Known appointments (CSV or SQLite) used to pre-fill confirmation calls;
+    # opened on first lookup so importing the app touches no files
+    return open_roster(os.getenv("APPOINTMENT_ROSTER"))
+
+# Speak the first sentence of each reply while the rest is still being generated
+VOICE_STREAMING = os.getenv("VOICE_STREAMING", "0") == "1"
+streaming_turns = {}
+STREAMING_RETRY_LINE = "Sorry, I didn't catch all of that. Could you say it again?"
+
+# Webhook arrival to TwiML response, i.e. the caller's time to first audio
+voice_latency = {"twiml": LatencyRecorder(), "streaming": LatencyRecorder()}
+
+# Canned lines for the opening, re-prompt and closing turns instead of an LLM call
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+response_cache = ResponseCache(
+    max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+)
+
+# Recurring lines rendered once and served as <Play>; unset AUDIO_SYNTH keeps Polly <Say>
+synthesizer = create_synthesizer(os.getenv("AUDIO_SYNTH", ""))
+audio_cache = None
+audio_renders = set()
+if synthesizer:
+    audio_cache = AudioCache(
+        os.getenv("AUDIO_CACHE_DIR", "audio_cache"),
+        synthesizer,
+        render_after=int(os.getenv("AUDIO_RENDER_AFTER", "2"))
+    )
+
+# Draft the next reply for the answers the caller is likely to give while they speak;
+# off by default, as it spends tokens on drafts that may not be used
+SPECULATION = os.getenv("SPECULATION", "0") == "1"
+speculator = Speculator(
+    max_tokens_per_call=int(os.getenv("SPECULATION_TOKENS_PER_CALL", "3000")),
+    # Drafts run outside llm_pool, so they never take a live turn's slot; this
+    # caps how many are in flight, and a draft past it is skipped, not queued
+    max_running=int(os.getenv("SPECULATION_POOL_SIZE", "2"))
+) if SPECULATION else None
+
+# Idle event streams send a ping this often so dashboards can tick their call timer
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "2"))
+
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    # Shed load instead of queueing unboundedly; Twilio falls back to the number's fallback URL
+    return Response(content=str(exc), status_code=503)
+
+async def prerender_audio():
+    if audio_cache:
+        for text in fixed_lines():
+            _render_audio(text)
+
+def shutdown_pools():
+    twilio_pool.shutdown()
+    tts_pool.shutdown()
+
+@router.get("/ready")
+async def ready(warm: bool = False):
+    """Readiness probe; ?warm=1 first builds the agents, call store, roster, OpenAI and Twilio clients"""
+    if not warm:
+        return {"ready": True}
+    started = time.perf_counter()
+    await asyncio.to_thread(_warm)
+    return {"ready": True, "warm_seconds": round(time.perf_counter() - started, 3)}
+
+def _warm():
+    conversation_manager.warm()
+    openai_client()
+    get_twilio_client()
+    get_roster()
+
+@router.post("/start-call")
 async def start_call(request: Request):
     data = await request.json()
     customer_number = data.get("phone_number")
     if not customer_number:
         return {"status": "error", "message": "Phone number is required"}
+    try:
+        details = await _known_details(data)
+    except LookupError as e:
+        return {"status": "error", "message": str(e)}
+    call_sid = await _place_call(customer_number, details, data.get("response_cache", RESPONSE_CACHE))
+    return {"status": "success", "sid": call_sid}
+
+async def _known_details(data):
+    """Details sent with the request, or looked up in the roster by appointment_id"""
+    appointment_id = data.get("appointment_id")
+    if not appointment_id:
+        return data.get("details")
+    # The roster reads a CSV or SQLite file, so the lookup runs off the event loop
+    details = await store_pool.run(_lookup_appointment, appointment_id)
+    if details is None:
+        raise LookupError(f"Unknown appointment {appointment_id}")
+    return details
+
+def _lookup_appointment(appointment_id):
+    roster = get_roster()
+    return roster.get(appointment_id) if roster else None
+
+async def _place_call(customer_number, details=None, response_cache=RESPONSE_CACHE):
+    """Dial a customer and set up the call's conversation; returns the CallSid"""
     webhook_url = f"{ngrok_base_url}/voice-webhook"
-    call = client.calls.create(to=customer_number, from_=twilio_number, url=webhook_url)
-    conversation_manager.initialize_conversation(call.sid)
-    return {"status": "success", "sid": call.sid}
+    call = await _twilio(
+        None,
+        get_twilio_client().calls.create,
+        to=customer_number,
+        from_=twilio_number,
+        url=webhook_url,
+        # Twilio pushes lifecycle changes to us instead of us fetching them
+        status_callback=f"{ngrok_base_url}/call-status-callback",
+        status_callback_event=["initiated", "ringing", "answered", "completed"],
+        status_callback_method="POST"
+    )
+    async with conversation_manager.lock_call(call.sid):
+        await _store(conversation_manager.initialize_conversation, call.sid, details, response_cache)
+    return call.sid
 
-@app.post("/end-call/{call_sid}")
+@router.post("/end-call/{call_sid}")
 async def end_call(call_sid: str):
     try:
-        client.calls(call_sid).update(status='completed')
+        await _twilio(call_sid, get_twilio_client().calls(call_sid).update, status='completed')
+        async with conversation_manager.lock_call(call_sid):
+            await _store(conversation_manager.finish_conversation, call_sid)
         return {"status": "success", "message": "Call ended successfully."}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@app.get("/call-status/{call_sid}")
+async def _twilio(call_sid, fn, *args, **kwargs):
+    """Run a blocking Twilio REST call on its pool, timed as a span"""
+    with spans.span("twilio_rest", call_sid):
+        return await twilio_pool.run(fn, *args, **kwargs)
+
+async def _store(fn, *args, **kwargs):
+    """Run a conversation_manager call that reads or writes call state, off the loop when the store is on disk"""
+    if conversation_manager.store.blocking:
+        return await store_pool.run(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+# Status callbacks for a call can reach any worker sharing the store; each
+# writes the status to the call's record, so that's where the others look first
+SHARED_STORE = shared_store_configured()
+
+async def _fetch_call_status(call_sid):
+    if SHARED_STORE:
+        status = await _store(conversation_manager.get_call_status, call_sid)
+        if status:
+            return status
+    call = await _twilio(call_sid, get_twilio_client().calls(call_sid).fetch)
+    return call.status
+
+status_cache = CallStatusCache(
+    _fetch_call_status,
+    max_size=int(os.getenv("CALL_STATUS_CACHE_SIZE", "10000")),
+    # Shared: only terminal statuses are served from memory, as another worker may have moved the call on
+    ttl_seconds=float(os.getenv("CALL_STATUS_TTL_SECONDS", "0" if SHARED_STORE else "30"))
+)
+
+@router.get("/call-status/{call_sid}")
 async def get_call_status(call_sid: str):
     try:
-        call = client.calls(call_sid).fetch()
-        return {"status": call.status}
+        return {"status": await status_cache.get(call_sid)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@app.post("/voice-webhook")
-async def voice_webhook(CallSid: str = Form(...), SpeechResult: str = Form(None)):
-    response = VoiceResponse()
-    
-    if SpeechResult:
-        conversation_manager.update_conversation(CallSid, "customer", SpeechResult)
+webhook_deduplicator = WebhookDeduplicator(
+    max_size=int(os.getenv("WEBHOOK_DEDUP_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", "60"))
+)
+
+@router.get("/webhook-dedup")
+async def get_webhook_dedup_stats():
+    return webhook_deduplicator.stats
+
+@router.get("/call-status-cache")
+async def get_call_status_cache_stats():
+    return status_cache.stats
+
+campaign_dispatcher = CampaignDispatcher(
+    _place_call,
+    status_cache.get,
+    calls_per_second=float(os.getenv("CAMPAIGN_CALLS_PER_SECOND", "1")),
+    max_concurrent=int(os.getenv("CAMPAIGN_MAX_CONCURRENT_CALLS", "10")),
+    max_attempts=int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3")),
+    backoff_seconds=float(os.getenv("CAMPAIGN_RETRY_BACKOFF_SECONDS", "300")),
+    max_campaigns=int(os.getenv("CAMPAIGN_HISTORY_SIZE", "1000")),
+    ttl_seconds=float(os.getenv("CAMPAIGN_HISTORY_TTL_SECONDS", "86400"))
+)
+
+@router.post("/campaigns")
+async def create_campaign(request: Request):
+    """Dial a batch of numbers: {"calls": [{"phone_number": ..., "details": {...} or "appointment_id": ...}, ...]}"""
+    data = await request.json()
+    calls = data.get("calls") or [{"phone_number": number} for number in data.get("phone_numbers", [])]
+    if not calls or not all(call.get("phone_number") for call in calls):
+        return {"status": "error", "message": "Every call needs a phone number"}
+    try:
+        calls = [{"phone_number": call["phone_number"], "details": await _known_details(call)} for call in calls]
+    except LookupError as e:
+        return {"status": "error", "message": str(e)}
+    campaign = campaign_dispatcher.create(calls)
+    return {"status": "success", "campaign_id": campaign["id"], "total": len(campaign["calls"])}
+
+@router.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str):
+    progress = campaign_dispatcher.progress(campaign_id)
+    if progress is None:
+        return {"status": "error", "message": "Unknown campaign"}
+    return progress
+
+@router.post("/call-status-callback")
+async def call_status_callback(CallSid: str = Form(...), CallStatus: str = Form(...)):
+    status_cache.set(CallSid, CallStatus)
+    campaign_dispatcher.on_status(CallSid, CallStatus)
+    async with conversation_manager.lock_call(CallSid):
+        await _store(conversation_manager.set_call_status, CallSid, CallStatus)
+    return Response(status_code=204)
+
+@router.get("/events/{call_sid}")
+async def call_events(call_sid: str):
+    """Server-sent events for one call: message, state (changed details), stage and status"""
+    queue = conversation_manager.events.subscribe(call_sid)
+
+    async def stream():
+        try:
+            # Start with the full picture so a dashboard can join mid-call
+            snapshot = await _store(_snapshot, call_sid)
+            yield format_sse("snapshot", snapshot)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if SHARED_STORE:
+                        # Turns that ran on other workers published their events there;
+                        # send their changes on as a fresh snapshot
+                        latest = await _store(_snapshot, call_sid)
+                        if latest != snapshot:
+                            snapshot = latest
+                            yield format_sse("snapshot", snapshot)
+                            if snapshot["status"] in TERMINAL_STATUSES:
+                                break
+                            continue
+                    yield format_sse("ping", {})
+                    continue
+                yield format_sse(event["type"], event["data"])
+                if event["type"] == "status" and event["data"] in TERMINAL_STATUSES:
+                    break
+        finally:
+            conversation_manager.events.unsubscribe(call_sid, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _snapshot(call_sid):
+    return {
+        "transcript": conversation_manager.get_transcript(call_sid),
+        "state": conversation_manager.get_conversation_state(call_sid),
+        "status": conversation_manager.get_call_status(call_sid)
+    }
+
+@router.post("/voice-webhook")
+async def voice_webhook(request: Request):
+    started = time.perf_counter()
+    form = await request.form()
+    CallSid = form.get("CallSid")
+    SpeechResult = form.get("SpeechResult")
+    if not CallSid:
+        return Response(content="CallSid is required", status_code=422)
+    spans.record("form_parse", time.perf_counter() - started, CallSid)
+
+    # A slow turn can make Twilio retry the webhook; the retry joins (or replays)
+    # the first delivery instead of appending the utterance and paying for it twice
+    key = delivery_key(CallSid, request.headers, form)
+    return await webhook_deduplicator.run(key, lambda: _voice_turn(CallSid, SpeechResult, key, started))
+
+async def _voice_turn(call_sid, speech_result, key, started):
+    if VOICE_STREAMING:
+        response = await _start_streaming_turn(call_sid, speech_result, key)
+        voice_latency["streaming"].observe(time.perf_counter() - started)
+        return response
+
+    # Follow-up webhooks for one call can land on any worker; hold the call's
+    # lock so their appends and extraction updates never interleave
+    async with conversation_manager.lock_call(call_sid):
+        # A retry that reached another worker finds the answer with the call
+        body = await _store(conversation_manager.recall_webhook_response, call_sid, key)
+        if body is not None:
+            webhook_deduplicator.stats["replayed"] += 1
+            return Response(content=body, media_type="application/xml")
+        response = await _handle_turn(call_sid, speech_result)
+        await _store(conversation_manager.remember_webhook_response, call_sid, key, response.body.decode("utf-8"))
+    voice_latency["twiml"].observe(time.perf_counter() - started)
+    return response
+
+async def _begin_turn(call_sid, speech_result):
+    """Record the caller's utterance and build the reply inputs; None means the call should conclude"""
+    if speech_result:
+        # Record the utterance now; extraction is pipelined with the reply
+        await _store(conversation_manager.update_conversation, call_sid, "customer", speech_result)
     
     # Check for confirmation in the customer's response
-    if SpeechResult and any(word in SpeechResult.lower() for word in ["yes", "confirm", "correct", "that's right"]):
-        state = conversation_manager.get_conversation_state(CallSid)
-        state["details_collected"]["appointment_confirmed"] = True
+    if speech_result and any(word in speech_result.lower() for word in ["yes", "confirm", "correct", "that's right"]):
+        await _store(conversation_manager.mark_confirmed, call_sid)
     
     # Check if we should end the call first
-    if conversation_manager.should_conclude(CallSid):
-        response.say("Thank you for confirming all the details! We look forward to seeing you and your pet. Have a wonderful day!", voice='Polly.Joanna-Neural')
-        response.hangup()
-        
-        # End the call through Twilio
-        try:
-            client.calls(CallSid).update(status='completed')
-        except Exception as e:
-            print(f"Error ending call: {e}")
-        
-        return Response(content=str(response), media_type="application/xml")
+    if await _store(conversation_manager.should_conclude, call_sid):
+        if speech_result:
+            await _extract(call_sid)
+        return None
     
-    state = conversation_manager.get_conversation_state(CallSid)
+    state = await _store(conversation_manager.get_conversation_state, call_sid)
     details = state.get("details_collected", {})
     
-    # Format details for the task
+    # Format the last-known details for the task; extraction of the new
+    # utterance runs alongside the reply and is reconciled afterwards
     details_str = "\n".join([f"{k}: {v}" for k, v in details.items() if v])
     
-    appointment_crew = Crew(
-        agents=[vet_appointment_agent],
-        tasks=[confirmation_task],
-        process=Process.sequential,
-        verbose=True
-    )
-    
-    crew_input = {
-        "call_sid": CallSid,
-        "conversation_context": conversation_manager.get_conversation_context(CallSid),
+    return {
+        "call_sid": call_sid,
+        "conversation_context": await _store(conversation_manager.get_reply_context, call_sid),
         "details_collected": details_str,
-        "conversation_stage": state.get("stage", "greeting")
+        "conversation_stage": state.get("stage", "greeting"),
+        "reply_model": model_router.reply_model(state.get("stage", "greeting"), details)
     }
 
-    crew_result = appointment_crew.kickoff(inputs=crew_input)
-    agent_response_text = crew_result.raw
+async def _handle_turn(call_sid, speech_result):
+    crew_input = await _begin_turn(call_sid, speech_result)
+    if crew_input is None:
+        return await _conclude_call(call_sid, VoiceResponse())
 
-    conversation_manager.update_conversation(CallSid, "agent", agent_response_text)
-    
+    turn = await _predictable_turn(call_sid, speech_result)
+    cached_text = await _cached_line(call_sid, turn)
+    if cached_text:
+        await _store(conversation_manager.update_conversation, call_sid, "agent", cached_text)
+        await _speculate(call_sid, crew_input, cached_text)
+        return _gather_response(call_sid, cached_text)
+
+    extracted, drafted_text = await _drafted_line(call_sid, speech_result)
+    if drafted_text:
+        if await _store(conversation_manager.should_conclude, call_sid):
+            return await _conclude_call(call_sid, VoiceResponse())
+        await _store(conversation_manager.update_conversation, call_sid, "agent", drafted_text)
+        await _speculate(call_sid, crew_input, drafted_text)
+        return _gather_response(call_sid, drafted_text)
+
+    reply = _reply_kickoff(call_sid, crew_input)
+    if speech_result and not extracted:
+        (agent_response_text, usage), _ = await asyncio.gather(reply, _extract(call_sid))
+    else:
+        agent_response_text, usage = await reply
+    await _store(conversation_manager.record_token_usage, call_sid, "reply", usage)
+    await _learn_line(call_sid, turn, agent_response_text)
+
+    # Extraction may have completed the details; in that case the drafted
+    # reply is stale and the call wraps up instead
+    if await _store(conversation_manager.should_conclude, call_sid):
+        return await _conclude_call(call_sid, VoiceResponse())
+
+    await _store(conversation_manager.update_conversation, call_sid, "agent", agent_response_text)
+    await _speculate(call_sid, crew_input, agent_response_text)
+    return _gather_response(call_sid, agent_response_text)
+
+async def _drafted_line(call_sid, speech_result):
+    """A reply drafted while the caller spoke, if they gave exactly what was predicted.
+
+    Only the deterministic extractor is consulted, so a miss costs next to
+    nothing. Returns whether the turn got extracted, and the line or None.
+    """
+    if not (speculator and speech_result and speculator.pending(call_sid)):
+        return False, None
+    given = await _store(conversation_manager.extract_details_fast, call_sid)
+    if given is None:
+        speculator.discard(call_sid)
+        return False, None
+    return True, await speculator.take(call_sid, given)
+
+async def _speculate(call_sid, crew_input, agent_text):
+    """Start drafting the replies to the answers the caller is likely to give next"""
+    if not speculator:
+        return
+    speculator.begin(call_sid)
+    state = await _store(conversation_manager.get_conversation_state, call_sid)
+    details = state.get("details_collected", {})
+    for fields in predict_answers(details, state.get("stage", "greeting")):
+        # Placeholders stand in for the values; take() fills in the real ones
+        predicted = {**details, **{field: placeholder(field) for field in fields}}
+        stage = infer_stage(predicted)
+        draft_input = {
+            **crew_input,
+            "conversation_context": f"{crew_input['conversation_context']}\nagent: {agent_text}\ncustomer: {' '.join(placeholder(field) for field in fields)}",
+            "details_collected": "\n".join(f"{k}: {v}" for k, v in predicted.items() if v),
+            "conversation_stage": stage,
+            "reply_model": model_router.reply_model(stage, predicted)
+        }
+        speculator.draft(call_sid, fields, lambda draft_input=draft_input: _draft_reply(call_sid, draft_input))
+
+async def _draft_reply(call_sid, crew_input):
+    model = crew_input["reply_model"]
+    llm = get_vet_appointment_agent(model).llm
+    with spans.span("speculative_reply", call_sid, crew_input["conversation_stage"]) as span:
+        text, usage = await complete(_reply_messages(crew_input), llm.model, llm.temperature)
+        span.update(usage, model=model)
+    return text, usage
+
+def _reply_messages(crew_input):
+    return build_messages(get_vet_appointment_agent(crew_input["reply_model"]), CONFIRMATION_TASK, crew_input)
+
+async def _reply_kickoff(call_sid, crew_input):
+    model = crew_input["reply_model"]
+    llm = get_vet_appointment_agent(model).llm
+    started = time.perf_counter()
+    with spans.span("reply_kickoff", call_sid, crew_input["conversation_stage"]) as span:
+        text, usage = await llm_pool.run(complete, _reply_messages(crew_input), llm.model, llm.temperature)
+        span.update(usage, model=model)
+    model_router.observe("reply", model, time.perf_counter() - started)
+    return text, usage
+
+async def _extract(call_sid):
+    """Extract details from the latest customer turn, making the manager's model calls here on the async client"""
+    request = await _store(conversation_manager.begin_extraction, call_sid)
+    while request is not None:
+        started = time.perf_counter()
+        try:
+            with spans.span("extraction_kickoff", call_sid, request["stage"]) as span:
+                raw, usage = await llm_pool.run(complete, request["messages"], **request["llm"])
+                span.update(usage, mode=request["mode"], model=request["model"])
+        except Exception as e:
+            await _store(conversation_manager.fail_extraction, call_sid, request, e)
+            return
+        request = await _store(conversation_manager.finish_extraction, call_sid, request, raw, usage, time.perf_counter() - started)
+
+async def _reply_stream(call_sid, crew_input, on_first_sentence):
+    model = crew_input["reply_model"]
+    llm = get_vet_appointment_agent(model).llm
+    messages = _reply_messages(crew_input)
+    started = time.perf_counter()
+    with spans.span("reply_stream", call_sid, crew_input["conversation_stage"]) as span:
+        text, usage = await stream_reply(messages, llm.model, llm.temperature, on_first_sentence)
+        span.update(usage, model=model)
+    model_router.observe("reply", model, time.perf_counter() - started)
+    return text, usage
+
+async def _predictable_turn(call_sid, speech_result):
+    """The opening line, or a re-prompt after silence; other turns need the LLM"""
+    if speech_result:
+        return None
+    return "reprompt" if await _store(conversation_manager.get_last_message, call_sid, "agent") else "opening"
+
+async def _cached_line(call_sid, turn):
+    if not turn:
+        return None
+    return await _store(_lookup_line, call_sid, turn)
+
+def _lookup_line(call_sid, turn):
+    if not conversation_manager.response_cache_enabled(call_sid):
+        return None
+    state = conversation_manager.get_conversation_state(call_sid)
+    last_question = last_sentence(conversation_manager.get_last_message(call_sid, "agent"))
+    return response_cache.lookup(turn, state["stage"], state["details_collected"], last_question)
+
+async def _learn_line(call_sid, turn, text):
+    if turn == "opening":
+        state = await _store(conversation_manager.get_conversation_state, call_sid)
+        response_cache.learn(turn, state["stage"], state["details_collected"], text)
+
+def _gather_response(call_sid, text):
+    response = VoiceResponse()
     full_webhook_url = f"{ngrok_base_url}/voice-webhook"
-    gather = Gather(input='speech', action=full_webhook_url, timeout=10, speechTimeout='auto')
-    gather.say(agent_response_text, voice='Polly.Joanna-Neural')
+    # Post silence back too, so the caller gets a re-prompt instead of a hang-up
+    gather = Gather(input='speech', action=full_webhook_url, timeout=10, speechTimeout='auto', actionOnEmptyResult=True)
+    if text:
+        _speak(gather, text)
     response.append(gather)
 
-    return Response(content=str(response), media_type="application/xml")
+    return _twiml(call_sid, response)
+
+def _twiml(call_sid, response):
+    with spans.span("twiml_render", call_sid):
+        return Response(content=str(response), media_type="application/xml")
+
+def _speak(verb, text):
+    """<Play> the pre-rendered audio for a line if there is some, otherwise <Say> it"""
+    name = audio_cache.lookup(text) if audio_cache else None
+    if name:
+        verb.play(f"{ngrok_base_url}/audio/{name}")
+        return
+    verb.say(text, voice='Polly.Joanna-Neural')
+    if audio_cache and audio_cache.wants_render(text):
+        _render_audio(text)
+
+def _render_audio(text):
+    task = asyncio.create_task(_render_audio_in_pool(text))
+    audio_renders.add(task)
+    task.add_done_callback(audio_renders.discard)
+
+async def _render_audio_in_pool(text):
+    try:
+        await tts_pool.run(audio_cache.render, text)
+    except PoolSaturatedError:
+        # Try again the next time the line comes round
+        audio_cache.release(text)
+    except Exception as e:
+        print(f"Error rendering audio: {e}")
+
+async def _start_streaming_turn(call_sid, speech_result, key):
+    loop = asyncio.get_running_loop()
+    first_audio = loop.create_future()
+    turn = asyncio.create_task(_streaming_turn(call_sid, speech_result, key, first_audio))
+    streaming_turns[call_sid] = turn
+    # /voice-continue normally collects the turn; forget it if Twilio never asks
+    turn.add_done_callback(lambda _: loop.call_later(120, _forget_streaming_turn, call_sid, turn))
+    return await first_audio
+
+def _forget_streaming_turn(call_sid, turn):
+    if streaming_turns.get(call_sid) is turn:
+        del streaming_turns[call_sid]
+
+async def _streaming_turn(call_sid, speech_result, key, first_audio):
+    """Run a whole turn under the call lock, handing the first sentence to the webhook as soon as it's ready"""
+    def on_first_sentence(sentence):
+        response = VoiceResponse()
+        _speak(response, sentence)
+        response.redirect(f"{ngrok_base_url}/voice-continue", method='POST')
+        first_audio.set_result(_twiml(call_sid, response))
+
+    try:
+        async with conversation_manager.lock_call(call_sid):
+            # As on the TwiML path, a retry that reached another worker replays the first answer
+            body = await _store(conversation_manager.recall_webhook_response, call_sid, key)
+            if body is not None:
+                webhook_deduplicator.stats["replayed"] += 1
+                first_audio.set_result(Response(content=body, media_type="application/xml"))
+                return
+            try:
+                await _run_streaming_turn(call_sid, speech_result, first_audio, on_first_sentence)
+            except Exception as e:
+                if not first_audio.done():
+                    raise
+                print(f"Error finishing streamed turn: {e}")
+                # The caller has heard the first sentence; /voice-continue must not guess the rest
+                await _store(conversation_manager.set_continuation, call_sid, {"failed": True})
+            await _store(conversation_manager.remember_webhook_response, call_sid, key, first_audio.result().body.decode("utf-8"))
+    except Exception as e:
+        if not first_audio.done():
+            first_audio.set_exception(e)
+
+async def _run_streaming_turn(call_sid, speech_result, first_audio, on_first_sentence):
+    crew_input = await _begin_turn(call_sid, speech_result)
+    if crew_input is None:
+        first_audio.set_result(await _conclude_call(call_sid, VoiceResponse()))
+        return
+
+    turn = await _predictable_turn(call_sid, speech_result)
+    cached_text = await _cached_line(call_sid, turn)
+    if cached_text:
+        await _store(conversation_manager.update_conversation, call_sid, "agent", cached_text)
+        first_audio.set_result(_gather_response(call_sid, cached_text))
+        return
+
+    reply = _reply_stream(call_sid, crew_input, on_first_sentence)
+    if speech_result:
+        (agent_response_text, usage), _ = await asyncio.gather(reply, _extract(call_sid))
+    else:
+        agent_response_text, usage = await reply
+    await _store(conversation_manager.record_token_usage, call_sid, "reply", usage)
+    await _learn_line(call_sid, turn, agent_response_text)
+
+    # Decided before the reply is recorded, as on the TwiML path, so the reply's
+    # own wording ("thank you ...") can't end the call
+    conclude = await _store(conversation_manager.should_conclude, call_sid)
+    if first_audio.done():
+        # The caller is already hearing the first sentence; /voice-continue
+        # speaks the rest, or wraps the call up if extraction completed it
+        if not conclude:
+            await _store(conversation_manager.update_conversation, call_sid, "agent", agent_response_text)
+        _, rest = split_first_sentence(agent_response_text)
+        await _store(conversation_manager.set_continuation, call_sid, {"conclude": conclude, "rest": rest})
+        return
+
+    # A single sentence with nothing after it, so there was nothing to flush early
+    if conclude:
+        first_audio.set_result(await _conclude_call(call_sid, VoiceResponse()))
+        return
+    await _store(conversation_manager.update_conversation, call_sid, "agent", agent_response_text)
+    first_audio.set_result(_gather_response(call_sid, agent_response_text))
+
+@router.post("/voice-continue")
+async def voice_continue(CallSid: str = Form(...)):
+    turn = streaming_turns.pop(CallSid, None)
+    if turn:
+        await turn
+    
+    # The lock also waits out a turn still streaming on another worker
+    async with conversation_manager.lock_call(CallSid):
+        continuation = await _store(conversation_manager.pop_continuation, CallSid)
+        if continuation is None or continuation.get("failed"):
+            # The turn broke after its first sentence; ask again rather than speak a stale message
+            return _gather_response(CallSid, STREAMING_RETRY_LINE)
+        if continuation["conclude"]:
+            return await _conclude_call(CallSid, VoiceResponse())
+    
+    return _gather_response(CallSid, continuation["rest"])
+
+async def _conclude_call(call_sid, response):
+    closing = await _cached_line(call_sid, "closing") or "Thank you for confirming all the details! We look forward to seeing you and your pet. Have a wonderful day!"
+    _speak(response, closing)
+    response.hangup()
+    
+    # End the call through Twilio
+    try:
+        await _twilio(call_sid, get_twilio_client().calls(call_sid).update, status='completed')
+    except Exception as e:
+        print(f"Error ending call: {e}")
+    await _store(conversation_manager.finish_conversation, call_sid)
+    if speculator:
+        speculator.finish(call_sid)
+    
+    return _twiml(call_sid, response)
 
 async def _end_call_after_delay(call_sid, delay_seconds=2):
     """End the call after a short delay to allow the final message to play"""
-    import asyncio
     await asyncio.sleep(delay_seconds)
     try:
-        client.calls(call_sid).update(status='completed')
+        await _twilio(call_sid, get_twilio_client().calls(call_sid).update, status='completed')
     except Exception as e:
         print(f"Error ending call: {e}")
 
-@app.get("/transcript/{call_sid}")
+@router.get("/transcript/{call_sid}")
 async def get_transcript(call_sid: str):
-    return {"transcript": conversation_manager.conversations.get(call_sid, [])}
+    return {"transcript": await _store(conversation_manager.get_transcript, call_sid)}
 
-@app.get("/conversation-state/{call_sid}")
+@router.get("/conversation-state/{call_sid}")
 async def get_conversation_state(call_sid: str):
-    return conversation_manager.get_conversation_state(call_sid)
\ No newline at end of file
+    return await _store(conversation_manager.get_conversation_state, call_sid)
+
+@router.get("/voice-latency")
+async def get_voice_latency():
+    return {mode: recorder.summary() for mode, recorder in voice_latency.items()}
+
+@router.get("/extraction-stats")
+async def get_extraction_stats():
+    return conversation_manager.get_extraction_stats()
+
+@router.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(spans.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/call-timeline/{call_sid}")
+async def get_call_timeline(call_sid: str):
+    return {"timeline": spans.timeline(call_sid)}
+
+@router.get("/audio-cache")
+async def get_audio_cache_stats():
+    return audio_cache.summary() if audio_cache else {"enabled": False}
+
+@router.get("/response-cache")
+async def get_response_cache_stats():
+    return response_cache.hit_rate()
+
+@router.get("/call-stats")
+async def get_call_stats():
+    return conversation_manager.get_call_stats()
+
+@router.get("/speculation")
+async def get_speculation_stats():
+    return speculator.summary() if speculator else {"enabled": False}
+
+@router.get("/model-routing")
+async def get_model_routing():
+    return model_router.stats()
+
+@router.get("/context-stats")
+async def get_context_stats():
+    return conversation_manager.get_context_stats()
+
+@router.get("/token-usage/{call_sid}")
+async def get_token_usage(call_sid: str):
+    return {"token_usage": await _store(conversation_manager.get_token_usage, call_sid)}
+
+def create_app():
+    """Build the FastAPI app; the heavy objects behind it are built on first use or by /ready?warm=1"""
+    app = FastAPI()
+    app.include_router(router)
+    app.add_exception_handler(PoolSaturatedError, pool_saturated_handler)
+    app.add_event_handler("startup", prerender_audio)
+    app.add_event_handler("shutdown", shutdown_pools)
+    if audio_cache:
+        app.mount("/audio", StaticFiles(directory=audio_cache.directory), name="audio")
+    return app
+
+app = create_app()
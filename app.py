@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import time
+import json
 import datetime
 
 st.set_page_config(layout="wide", page_title="Vet Feedback Agent")
@@ -15,80 +16,130 @@ if 'call_active' not in st.session_state:
 if 'call_start_time' not in st.session_state:
     st.session_state.call_start_time = None
 
+TERMINAL_STATUSES = ["completed", "canceled", "failed", "no-answer", "busy"]
+
+def message_html(message):
+    if message['role'] == 'agent':
+        return f"<p><b>🤖 Agent:</b> {message['content']}</p>"
+    elif message['role'] == 'customer':
+        return f"<p><b>👤 Customer:</b> {message['content']}</p>"
+    return ""
+
 def display_call_summary(call_sid):
     # Display Transcript
     transcript_response = requests.get(f"{API_URL}/transcript/{call_sid}")
     if transcript_response.status_code == 200:
         data = transcript_response.json()
-        transcript_html = ""
-        for message in data.get("transcript", []):
-            if message['role'] == 'agent':
-                transcript_html += f"<p><b>🤖 Agent:</b> {message['content']}</p>"
-            elif message['role'] == 'customer':
-                transcript_html += f"<p><b>👤 Customer:</b> {message['content']}</p>"
+        transcript_html = "".join(message_html(message) for message in data.get("transcript", []))
         transcript_placeholder.markdown(transcript_html, unsafe_allow_html=True)
 
     # Display Conversation & Pet State in Sidebar
     state_response = requests.get(f"{API_URL}/conversation-state/{call_sid}")
     if state_response.status_code == 200:
-        state_data = state_response.json()
-        
-        with state_placeholder.container():
-            stage = state_data.get('stage', 'N/A').replace('_', ' ').capitalize()
-            st.metric("Conversation Stage", stage)
+        render_state(state_response.json())
+
+def read_events(stream):
+    """Yield (event, data) pairs from a server-sent event stream"""
+    event_type, data_lines = None, []
+    for line in stream.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if event_type and data_lines:
+                yield event_type, json.loads("\n".join(data_lines))
+            event_type, data_lines = None, []
+        elif line.startswith("event:"):
+            event_type = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def follow_call(call_sid):
+    """Update the dashboard from the call's event stream until the call ends"""
+    transcript_html = ""
+    state_data = {"stage": "greeting", "details_collected": {}}
+    with requests.get(f"{API_URL}/events/{call_sid}", stream=True, timeout=(5, 30)) as stream:
+        for event_type, data in read_events(stream):
+            # Pings arrive every couple of seconds, which keeps the timer ticking
+            elapsed_time = time.time() - st.session_state.call_start_time
+            timer_placeholder.metric("Call Duration", str(datetime.timedelta(seconds=int(elapsed_time))))
             
-            # Show progress based on stage
-            stages = ["Greeting", "Collecting guardian", "Collecting pet details", 
-                     "Collecting appointment", "Confirming", "Concluded"]
-            current_index = stages.index(stage) if stage in stages else 0
-            st.progress((current_index + 1) / len(stages))
+            if event_type == "snapshot":
+                transcript_html = "".join(message_html(message) for message in data.get("transcript", []))
+                transcript_placeholder.markdown(transcript_html, unsafe_allow_html=True)
+                state_data = data.get("state") or state_data
+                render_state(state_data)
+                if data.get("status") in TERMINAL_STATUSES:
+                    return
+            elif event_type == "message":
+                # Append to what's already rendered instead of rebuilding the transcript
+                transcript_html += message_html(data)
+                transcript_placeholder.markdown(transcript_html, unsafe_allow_html=True)
+            elif event_type == "state":
+                state_data.setdefault("details_collected", {}).update(data)
+                render_state(state_data)
+            elif event_type == "stage":
+                state_data["stage"] = data
+                render_state(state_data)
+            elif event_type == "status" and data in TERMINAL_STATUSES:
+                return
+
+def render_state(state_data):
+    with state_placeholder.container():
+        stage = state_data.get('stage', 'N/A').replace('_', ' ').capitalize()
+        st.metric("Conversation Stage", stage)
+        
+        # Show progress based on stage
+        stages = ["Greeting", "Collecting guardian", "Collecting pet details", 
+                 "Collecting appointment", "Confirming", "Concluded"]
+        current_index = stages.index(stage) if stage in stages else 0
+        st.progress((current_index + 1) / len(stages))
 
-        with pet_details_placeholder.container():
-            details = state_data.get('details_collected', {})
-            confirmed_status = "✅ Confirmed" if stage in ["Confirming", "Concluded"] else "⏳ Pending"
+    with pet_details_placeholder.container():
+        details = state_data.get('details_collected', {})
+        confirmed_status = "✅ Confirmed" if stage in ["Confirming", "Concluded"] else "⏳ Pending"
 
-            st.subheader("🐾 Collected Details")
+        st.subheader("🐾 Collected Details")
 
-            st.subheader("🐾 Collected Details")
+        st.subheader("🐾 Collected Details")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            if details.get('guardian_name'):
+                st.success(f"**Guardian:** {details.get('guardian_name')}")
+            else:
+                st.info("**Guardian:** Not collected")
             
-            col1, col2 = st.columns(2)
+            if details.get('pet_name'):
+                st.success(f"**Pet Name:** {details.get('pet_name')}")
+            else:
+                st.info("**Pet Name:** Not collected")
             
-            with col1:
-                if details.get('guardian_name'):
-                    st.success(f"**Guardian:** {details.get('guardian_name')}")
-                else:
-                    st.info("**Guardian:** Not collected")
-                
-                if details.get('pet_name'):
-                    st.success(f"**Pet Name:** {details.get('pet_name')}")
-                else:
-                    st.info("**Pet Name:** Not collected")
-                
-                if details.get('pet_species'):
-                    st.success(f"**Species:** {details.get('pet_species')}")
-                else:
-                    st.info("**Species:** Not collected")
+            if details.get('pet_species'):
+                st.success(f"**Species:** {details.get('pet_species')}")
+            else:
+                st.info("**Species:** Not collected")
+        
+        with col2:
+            if details.get('pet_breed'):
+                st.success(f"**Breed:** {details.get('pet_breed')}")
+            else:
+                st.info("**Breed:** Not collected")
             
-            with col2:
-                if details.get('pet_breed'):
-                    st.success(f"**Breed:** {details.get('pet_breed')}")
-                else:
-                    st.info("**Breed:** Not collected")
-                
-                if details.get('pet_dob'):
-                    st.success(f"**DOB/Age:** {details.get('pet_dob')}")
-                else:
-                    st.info("**DOB/Age:** Not collected")
-                
-                if details.get('appointment_date'):
-                    appointment_text = details.get('appointment_date')
-                    if details.get('appointment_time'):
-                        appointment_text += f" at {details.get('appointment_time')}"
-                    st.success(f"**Appointment:** {appointment_text}")
-                else:
-                    st.info("**Appointment:** Not scheduled")
+            if details.get('pet_dob'):
+                st.success(f"**DOB/Age:** {details.get('pet_dob')}")
+            else:
+                st.info("**DOB/Age:** Not collected")
             
-            st.write(f"**Status:** {confirmed_status}")
+            if details.get('appointment_date'):
+                appointment_text = details.get('appointment_date')
+                if details.get('appointment_time'):
+                    appointment_text += f" at {details.get('appointment_time')}"
+                st.success(f"**Appointment:** {appointment_text}")
+            else:
+                st.info("**Appointment:** Not scheduled")
+        
+        st.write(f"**Status:** {confirmed_status}")
 
 
 # --- Sidebar for Controls and Status ---
@@ -140,28 +191,19 @@ transcript_placeholder = st.empty()
 
 
 if st.session_state.call_active:
-    while st.session_state.call_active:
-        try:
-            status_response = requests.get(f"{API_URL}/call-status/{st.session_state.call_sid}")
-            if status_response.status_code == 200:
-                status = status_response.json().get("status")
-                if status in ["completed", "canceled", "failed", "no-answer"]:
-                    st.session_state.call_active = False
-                    st.info("Call has ended.")
-                    time.sleep(1)
-                    st.rerun()
-                    break
-            
-            elapsed_time = time.time() - st.session_state.call_start_time
-            timer_placeholder.metric("Call Duration", str(datetime.timedelta(seconds=int(elapsed_time))))
-            
-            display_call_summary(st.session_state.call_sid)
-            
-            time.sleep(2)
-        except requests.ConnectionError:
-            st.error("Connection to API server has been lost.")
-            st.session_state.call_active = False
-            st.rerun()
+    try:
+        follow_call(st.session_state.call_sid)
+        st.session_state.call_active = False
+        st.info("Call has ended.")
+        time.sleep(1)
+        st.rerun()
+    except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ReadTimeout):
+        # The stream dropped mid-call; reconnecting replays a fresh snapshot
+        st.rerun()
+    except requests.ConnectionError:
+        st.error("Connection to API server has been lost.")
+        st.session_state.call_active = False
+        st.rerun()
 
 elif st.session_state.call_sid:
     timer_placeholder.info("Call concluded.")
@@ -0,0 +1,121 @@
+import io
+import os
+import math
+import wave
+import struct
+import hashlib
+import threading
+
+class OpenAISynthesizer:
+    """Renders speech with OpenAI's TTS endpoint as MP3"""
+    extension = "mp3"
+
+    def __init__(self, model="tts-1", voice="nova"):
+        self.model = model
+        self.voice = voice
+        self.name = f"openai:{model}:{voice}"
+        self._client = None
+
+    def __call__(self, text):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        return self._client.audio.speech.create(model=self.model, voice=self.voice, input=text, response_format="mp3").content
+
+class ToneSynthesizer:
+    """Local stand-in that renders a short tone per word, for tests and offline runs"""
+    extension = "wav"
+    name = "local:tone"
+
+    def __init__(self, sample_rate=8000):
+        self.sample_rate = sample_rate
+
+    def __call__(self, text):
+        frames = bytearray()
+        for i, _ in enumerate(text.split()):
+            frequency = 440 + 40 * (i % 5)
+            for n in range(self.sample_rate // 5):
+                frames += struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * n / self.sample_rate)))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self.sample_rate)
+            out.writeframes(bytes(frames))
+        return buffer.getvalue()
+
+class AudioCache:
+    """Pre-rendered audio for recurring prompts, stored on disk under a hash of voice and text.
+
+    Lines spoken `render_after` times get rendered once in the background; from
+    then on they can be played from `directory` instead of going through TTS.
+    """
+    def __init__(self, directory, synthesize, render_after=2, max_tracked=10000):
+        self.directory = directory
+        self.synthesize = synthesize
+        self.render_after = render_after
+        self.max_tracked = max_tracked
+        self.stats = {"spoken": 0, "played": 0}
+        self._seen = {}
+        self._rendering = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self, text):
+        digest = hashlib.sha256(f"{self.synthesize.name}\n{text}".encode()).hexdigest()
+        return f"{digest}.{self.synthesize.extension}"
+
+    def lookup(self, text):
+        """File name of the cached asset for `text`, or None; counts the line either way"""
+        name = self.filename(text)
+        cached = os.path.exists(os.path.join(self.directory, name))
+        with self._lock:
+            self.stats["spoken"] += 1
+            self.stats["played"] += int(cached)
+        return name if cached else None
+
+    def wants_render(self, text):
+        """True once a line has recurred often enough to be worth rendering"""
+        with self._lock:
+            if text in self._rendering:
+                return False
+            if len(self._seen) >= self.max_tracked:
+                self._seen.clear()
+            self._seen[text] = self._seen.get(text, 0) + 1
+            if self._seen[text] < self.render_after:
+                return False
+            self._rendering.add(text)
+            return True
+
+    def render(self, text):
+        """Synthesise `text` into the cache (blocking)"""
+        try:
+            path = os.path.join(self.directory, self.filename(text))
+            if not os.path.exists(path):
+                audio = self.synthesize(text)
+                # Write then rename so a half-written file is never served
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, path)
+        finally:
+            self.release(text)
+
+    def release(self, text):
+        """Forget a render that finished or was never started"""
+        with self._lock:
+            self._rendering.discard(text)
+            self._seen.pop(text, None)
+
+    def summary(self):
+        with self._lock:
+            spoken = self.stats["spoken"]
+            return {**self.stats, "cached_fraction": self.stats["played"] / spoken if spoken else None}
+
+def create_synthesizer(name):
+    """The synthesiser named by AUDIO_SYNTH ("openai" or "local"), or None to keep using <Say>"""
+    if name == "openai":
+        return OpenAISynthesizer(model=os.getenv("AUDIO_TTS_MODEL", "tts-1"), voice=os.getenv("AUDIO_TTS_VOICE", "nova"))
+    if name == "local":
+        return ToneSynthesizer()
+    return None
@@ -0,0 +1,115 @@
+"""Dashboard load benchmark: API requests and Twilio fetches per open dashboard.
+
+Serves the app on a local port with a fake Twilio client, places one call and
+points a number of dashboards at it for a while, twice:
+
+  polling  what app.py used to do: GET /call-status, /transcript and
+           /conversation-state every 2 seconds
+  events   what it does now: hold one GET /events/{call_sid} stream
+
+    python bench_dashboard.py --dashboards 5 --seconds 30 --output dashboard.json
+"""
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+# Sets up the offline environment (temporary store, no real credentials)
+from replay import FakeTwilioClient
+
+class CountingApp:
+    """ASGI wrapper counting HTTP requests per path"""
+    def __init__(self, app):
+        self.app = app
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            with self._lock:
+                self.requests[scope["path"]] = self.requests.get(scope["path"], 0) + 1
+        await self.app(scope, receive, send)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def poll(base_url, call_sid, deadline, interval):
+    import requests
+    while time.time() < deadline:
+        for path in (f"/call-status/{call_sid}", f"/transcript/{call_sid}", f"/conversation-state/{call_sid}"):
+            requests.get(base_url + path, timeout=10)
+        time.sleep(interval)
+
+def follow(base_url, call_sid, deadline, interval):
+    import requests
+    # Pings every EVENT_KEEPALIVE_SECONDS give the loop a chance to notice the deadline
+    with requests.get(f"{base_url}/events/{call_sid}", stream=True, timeout=(5, 30)) as stream:
+        for _ in stream.iter_lines():
+            if time.time() >= deadline:
+                return
+
+def run_mode(mode, base_url, call_sid, counting, twilio_client, dashboards, seconds, interval):
+    counting.requests.clear()
+    twilio_client.fetches = 0
+    deadline = time.time() + seconds
+    target = poll if mode == "polling" else follow
+    threads = [threading.Thread(target=target, args=(base_url, call_sid, deadline, interval)) for _ in range(dashboards)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    per_minute = 60 / seconds / dashboards
+    requests_made = sum(counting.requests.values())
+    return {
+        "requests": dict(counting.requests),
+        "api_requests_per_minute_per_dashboard": round(requests_made * per_minute, 2),
+        "twilio_fetches_per_minute_per_dashboard": round(twilio_client.fetches * per_minute, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dashboards", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=30, help="how long each mode runs")
+    parser.add_argument("--poll-seconds", type=float, default=2, help="the old dashboard's polling interval")
+    parser.add_argument("--output", help="write the JSON report here instead of to stdout")
+    args = parser.parse_args()
+
+    import api
+    import uvicorn
+    import requests
+    twilio_client = FakeTwilioClient()
+    api.get_twilio_client = lambda: twilio_client
+    counting = CountingApp(api.app)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(counting, host="127.0.0.1", port=port, log_level="warning"))
+    serving = threading.Thread(target=server.run, daemon=True)
+    serving.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    call_sid = requests.post(f"{base_url}/start-call", json={"phone_number": "+15550100"}, timeout=10).json()["sid"]
+    requests.post(f"{base_url}/call-status-callback", data={"CallSid": call_sid, "CallStatus": "in-progress"}, timeout=10)
+
+    report = {"dashboards": args.dashboards, "seconds": args.seconds, "poll_seconds": args.poll_seconds}
+    for mode in ("polling", "events"):
+        report[mode] = run_mode(mode, base_url, call_sid, counting, twilio_client, args.dashboards, args.seconds, args.poll_seconds)
+        print(f"{mode}: {report[mode]['api_requests_per_minute_per_dashboard']} requests/min per dashboard", file=sys.stderr)
+    server.should_exit = True
+    serving.join()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
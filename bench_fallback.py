@@ -0,0 +1,88 @@
+"""Microbenchmark: per-turn cost of the regex fallback extraction on long calls.
+
+"rescan" is the original approach: every pattern searched one by one over all
+the customer's messages so far. "incremental" is FALLBACK_MATCHERS over only the
+text not scanned yet. The caller makes small talk that fills no field, so every
+field is scanned on every turn, the worst case for both. The first value each
+approach finds is compared on the whole text before timing.
+
+    python bench_fallback.py
+    python bench_fallback.py --turns 10,100,1000
+"""
+import re
+import sys
+import json
+import time
+import argparse
+from extraction import FALLBACK_PATTERNS, FALLBACK_MATCHERS, fallback_window
+
+SMALL_TALK = [
+    "Sorry, could you repeat that please?",
+    "Hang on, the kettle is boiling.",
+    "We were out walking all morning so everyone is tired.",
+    "Honestly the weather has been awful lately.",
+    "Give me a second to find my diary."
+]
+
+def rescan_turn(messages, utterance, scanned):
+    messages.append(utterance)
+    text = " ".join(messages).lower()
+    found = {}
+    for field, patterns in FALLBACK_PATTERNS.items():
+        for pattern in patterns:
+            match = re.search(pattern, text)
+            if match:
+                found[field] = match.group(1).strip()
+                break
+    return found, len(messages)
+
+def incremental_turn(messages, utterance, scanned):
+    messages.append(utterance)
+    text = fallback_window(messages, scanned)
+    found = {}
+    for field, matcher in FALLBACK_MATCHERS.items():
+        for value in matcher.candidates(text):
+            found[field] = value
+            break
+    return found, len(messages)
+
+def check_same_results():
+    """Both approaches pick the same first value on a text that fills every field"""
+    text = ("Hi, my name is ana. My dog's name is biscuit, she's a golden retriever and 7 years old. "
+            "The appointment is march 5th at 9:30 am.").lower()
+    for field, patterns in FALLBACK_PATTERNS.items():
+        expected = next((m.group(1).strip() for m in (re.search(p, text) for p in patterns) if m), None)
+        got = next(FALLBACK_MATCHERS[field].candidates(text), None)
+        if got != expected:
+            raise AssertionError(f"{field}: incremental found {got!r}, rescan found {expected!r}")
+
+def per_turn_us(turn, turns, repeat, measured=20):
+    """Average cost of a fallback on a call that already has `turns` customer messages"""
+    best = None
+    for _ in range(repeat):
+        messages = [SMALL_TALK[i % len(SMALL_TALK)] for i in range(turns)]
+        scanned = len(messages)
+        started = time.perf_counter()
+        for i in range(measured):
+            _, scanned = turn(messages, SMALL_TALK[i % len(SMALL_TALK)], scanned)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / measured * 1e6, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="10,100,500", help="comma-separated call lengths, in customer messages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check_same_results()
+    report = {}
+    for turns in map(int, args.turns.split(",")):
+        report[turns] = {
+            "rescan_us_per_turn": per_turn_us(rescan_turn, turns, args.repeat),
+            "incremental_us_per_turn": per_turn_us(incremental_turn, turns, args.repeat)
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
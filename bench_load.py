@@ -0,0 +1,86 @@
+"""Load test: webhook latency as concurrent calls go from 1 to 50.
+
+Runs replay.py (fake LLMs and a fake Twilio client) once per concurrency level,
+each in a fresh interpreter with the same number of calls per slot, after the
+/ready?warm=1 warm-up. The pools are sized above the top level, so any growth in
+turn latency comes from the event loop being held up, not from queueing for a slot:
+
+    python bench_load.py --output load.json
+    python bench_load.py --levels 1,10,50 --max-growth 1.5   # exit 1 if p50 grows more than 50%
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+# Model latencies in the range of the real APIs, as median,p95 in ms. At replay's
+# own defaults of tens of milliseconds, 50 calls ask for more turns per second
+# than one process can serve however it's written, which measures CPU, not
+# blocking. Passing any of these options overrides them.
+MODEL_LATENCY = [
+    "--reply-latency", "800,2000",
+    "--extraction-latency", "600,1500",
+    "--small-reply-latency", "400,1000",
+    "--small-extraction-latency", "300,800"
+]
+
+def run_level(concurrency, calls, extra):
+    here = os.path.dirname(os.path.abspath(__file__))
+    workers = str(2 * concurrency + 16)
+    env = {
+        **os.environ,
+        "LLM_POOL_SIZE": workers,
+        "TWILIO_POOL_SIZE": workers,
+        "STORE_POOL_SIZE": workers
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "report.json")
+        subprocess.run(
+            [sys.executable, "replay.py", "--calls", str(calls), "--concurrency", str(concurrency), "--output", output, *MODEL_LATENCY, *extra],
+            cwd=here, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(output) as f:
+            report = json.load(f)
+    return {
+        "calls": calls,
+        "turn_latency_ms": report["turn_latency_ms"],
+        # The opening line comes from the response cache, so this is latency with no LLM call at all
+        "opening_turn_p50_ms": report["turn_latency_p50_ms_by_turn"]["0"],
+        "turns_per_second": report["turns_per_second"],
+        "concluded_fraction": report["concluded_fraction"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,5,10,25,50", help="comma-separated concurrent call counts")
+    parser.add_argument("--calls-per-slot", type=int, default=4, help="calls replayed per concurrent slot at each level")
+    parser.add_argument("--max-growth", type=float, help="fail if p50 at the top level exceeds p50 at the first by this factor")
+    parser.add_argument("--output", help="write the JSON report here instead of to stdout")
+    args, extra = parser.parse_known_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    report = {"levels": {}}
+    for concurrency in levels:
+        report["levels"][concurrency] = run_level(concurrency, concurrency * args.calls_per_slot, extra)
+        print(f"{concurrency} concurrent: {report['levels'][concurrency]['turn_latency_ms']}", file=sys.stderr)
+
+    first = report["levels"][levels[0]]["turn_latency_ms"]["p50"]
+    last = report["levels"][levels[-1]]["turn_latency_ms"]["p50"]
+    report["p50_growth"] = round(last / first, 3) if first else None
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.max_growth and report["p50_growth"] is not None and report["p50_growth"] > args.max_growth:
+        print(f"p50 turn latency grew {report['p50_growth']}x from {levels[0]} to {levels[-1]} concurrent calls", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Soak test: resident memory over 100k simulated calls.
+
+Each call goes through the ConversationManager the way the webhooks drive it
+(start, a few turns through the fast extractor, a status callback, finish, then
+the closing turn's token usage and webhook answer) against a throwaway SQLite
+store, without any LLM. A share of the calls are abandoned without finishing,
+so the live cache's size bound has to push them out. Resident memory should
+level off once the cache is full, and no finished call may come back into it:
+
+    python bench_soak.py --output soak.json
+    python bench_soak.py --calls 20000 --live-calls 1000 --max-growth-mb 20
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+TURNS = [
+    "Hi, my name is {guardian}.",
+    "My dog's name is {pet} and {pet} is 7 years old.",
+    "{pet} is a Beagle.",
+    "The appointment is on March 5 at 9:30 AM.",
+    "Yes, that's correct."
+]
+GUARDIANS = ["Ana Lopez", "Sam Green", "Priya Shah", "Tom Baker"]
+PETS = ["Biscuit", "Luna", "Max", "Pepper"]
+CLOSING_USAGE = {"prompt_tokens": 900, "completion_tokens": 30, "total_tokens": 930}
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current outside Linux, which is still what a leak would move
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--live-calls", type=int, default=2000, help="live call cache size (LIVE_CALL_CACHE_SIZE)")
+    parser.add_argument("--abandon-rate", type=float, default=0.1, help="share of calls never finished")
+    parser.add_argument("--samples", type=int, default=20, help="memory samples over the run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-growth-mb", type=float, help="fail if memory grows more than this after the first quarter")
+    parser.add_argument("--output", help="write the JSON report here instead of to stdout")
+    args = parser.parse_args()
+
+    os.environ["CONVERSATION_STORE"] = "sqlite"
+    os.environ["CONVERSATION_DB"] = os.path.join(tempfile.mkdtemp(prefix="soak-"), "conversations.db")
+    os.environ["LIVE_CALL_CACHE_SIZE"] = str(args.live_calls)
+    from manager import ConversationManager
+
+    manager = ConversationManager()
+    rng = random.Random(args.seed)
+    every = max(args.calls // args.samples, 1)
+    samples = []
+    reloaded = 0
+    started = time.perf_counter()
+    for i in range(args.calls):
+        call_sid = f"CA{i:032x}"
+        values = {"guardian": rng.choice(GUARDIANS), "pet": rng.choice(PETS)}
+        manager.initialize_conversation(call_sid)
+        manager.set_call_status(call_sid, "in-progress")
+        for turn in TURNS:
+            manager.update_conversation(call_sid, "agent", "Could you tell me a bit more?")
+            manager.update_conversation(call_sid, "customer", turn.format(**values))
+            manager.extract_details_fast(call_sid)
+        if rng.random() >= args.abandon_rate:
+            manager.set_call_status(call_sid, "completed")
+            manager.finish_conversation(call_sid)
+            # What the closing turn records once the call is already finished
+            manager.record_token_usage(call_sid, "reply", CLOSING_USAGE)
+            manager.remember_webhook_response(call_sid, f"closing-{i}", "<Response><Hangup/></Response>")
+            reloaded += manager.store.is_live(call_sid)
+        if (i + 1) % every == 0:
+            samples.append({"calls": i + 1, "rss_mb": round(rss_bytes() / 2 ** 20, 1)})
+            print(f"{i + 1} calls: {samples[-1]['rss_mb']} MB", file=sys.stderr)
+
+    settled = samples[len(samples) // 4]["rss_mb"]
+    report = {
+        "calls": args.calls,
+        "live_calls": args.live_calls,
+        "abandon_rate": args.abandon_rate,
+        "elapsed_seconds": round(time.perf_counter() - started, 1),
+        "rss_mb": samples,
+        "growth_after_first_quarter_mb": round(samples[-1]["rss_mb"] - settled, 1),
+        "finished_calls_back_in_memory": reloaded
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if reloaded:
+        print(f"{reloaded} finished calls were loaded back into the live cache", file=sys.stderr)
+        return 1
+    if args.max_growth_mb is not None and report["growth_after_first_quarter_mb"] > args.max_growth_mb:
+        print(f"memory grew {report['growth_after_first_quarter_mb']} MB after the first quarter", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
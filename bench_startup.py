@@ -0,0 +1,92 @@
+"""Cold-start benchmark: import-time breakdown of `import api` plus readiness timings.
+
+Each measurement runs in a fresh interpreter. Point --repo at another checkout
+(e.g. a `git worktree` of an older commit) to compare before and after:
+
+    python bench_startup.py --output startup.json
+    python bench_startup.py --repo ../vetagent-old
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Runs in the child: time the import, then a cold and a warming readiness probe
+PROBE = """
+import json, time, asyncio
+started = time.perf_counter()
+import api
+imported = time.perf_counter() - started
+
+async def probe():
+    import httpx
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        timings = {}
+        for name, path in [("ready_ms", "/ready"), ("ready_warm_ms", "/ready?warm=1")]:
+            started = time.perf_counter()
+            response = await http.get(path)
+            response.raise_for_status()
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+        return timings
+
+print(json.dumps({"import_api_ms": round(imported * 1000, 2), **asyncio.run(probe())}))
+"""
+
+def child_env():
+    env = dict(os.environ)
+    # Start without credentials, as a fresh autoscaled instance might
+    for name in ("OPENAI_API_KEY", "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN"):
+        env.pop(name, None)
+    env["OPENAI_API_KEY"] = "bench"
+    env.setdefault("CONVERSATION_STORE", "memory")
+    env.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    env.setdefault("OTEL_SDK_DISABLED", "true")
+    return env
+
+def import_breakdown(repo, top):
+    """Parse `python -X importtime -c "import api"` into per-module cumulative times"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=repo, env=child_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import api failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level after the separator's space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append({"module": name.strip(), "depth": depth, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+
+    total = next((m["cumulative_ms"] for m in reversed(modules) if m["module"] == "api"), None)
+    # The heaviest direct imports of api and its siblings tell you where boot time goes
+    heaviest = sorted((m for m in modules if m["depth"] <= 1), key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+    return {"import_api_cumulative_ms": total, "heaviest_imports": heaviest}
+
+def readiness(repo):
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=repo, env=child_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"readiness probe failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", default=os.path.dirname(os.path.abspath(__file__)), help="checkout to measure")
+    parser.add_argument("--top", type=int, default=15, help="how many of the heaviest imports to list")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    report = {"repo": os.path.abspath(args.repo), **import_breakdown(args.repo, args.top), **readiness(args.repo)}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Microbenchmark: per-turn transcript work with list-of-dicts vs Transcript.
+
+Each simulated turn appends the customer's utterance, renders the context twice
+(extraction and reply), looks up the last agent message (conclusion check) and
+appends the agent's reply; this is what the webhook does per turn. The
+append-only column leaves out the renders, as with REPLY_CONTEXT=window and
+incremental extraction. Both Transcript columns should stay flat as the call
+grows, since appends extend the rendered context rather than rebuild it.
+
+    python bench_transcript.py
+"""
+import sys
+import json
+import time
+import argparse
+from transcript import Transcript
+
+UTTERANCE = "My dog's name is Biscuit and she is a four year old golden retriever."
+REPLY = "Thanks! And what date and time would suit you for Biscuit's appointment?"
+
+def list_turn(messages):
+    messages.append({"role": "customer", "content": UTTERANCE})
+    for _ in range(2):
+        "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+    agent_messages = [msg["content"] for msg in messages if msg["role"] == "agent"]
+    agent_messages[-1].lower() if agent_messages else ""
+    messages.append({"role": "agent", "content": REPLY})
+
+def transcript_turn(transcript):
+    transcript.append("customer", UTTERANCE)
+    for _ in range(2):
+        transcript.context
+    transcript.last("agent").lower()
+    transcript.append("agent", REPLY)
+
+def append_turn(transcript):
+    transcript.append("customer", UTTERANCE)
+    transcript.last("agent").lower()
+    transcript.append("agent", REPLY)
+
+def per_turn_us(turn, make, turns, repeat, measured=20):
+    """Average cost of a turn on a call that already has `turns` turns"""
+    best = None
+    for _ in range(repeat):
+        history = make()
+        for _ in range(turns):
+            turn(history)
+        started = time.perf_counter()
+        for _ in range(measured):
+            turn(history)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / measured * 1e6, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="10,100,1000", help="comma-separated call lengths")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for turns in map(int, args.turns.split(",")):
+        report[turns] = {
+            "list_of_dicts_us_per_turn": per_turn_us(list_turn, list, turns, args.repeat),
+            "transcript_us_per_turn": per_turn_us(transcript_turn, Transcript, turns, args.repeat),
+            "transcript_append_only_us_per_turn": per_turn_us(append_turn, Transcript, turns, args.repeat)
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Microbenchmark: per-turn reply overhead outside the LLM.
+
+The same reply inputs are sent for the reply three ways, each to a model that
+answers instantly, so what's timed is the app's own cost per turn:
+
+  crew_per_webhook  what voice_webhook first did: a new verbose Crew for every utterance
+  reused_crew       one crew built up front and kicked off for every turn
+  async_client      the path turns take now: the prompt built from the agent and
+                    task dict and sent with OpenAI's async client, answered by a
+                    mock transport
+
+crewai's model wrapper is replaced by an instant stub, so the two crew columns
+leave out litellm's own overhead and if anything flatter the crews. The reply
+is compared across the three before timing.
+
+    python bench_turn.py
+    python bench_turn.py --turns 200 --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+
+os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") or "bench"
+os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+os.environ["OTEL_SDK_DISABLED"] = "true"
+
+REPLY = "Lovely to meet you, Ana! What's your pet's name, and how old are they?"
+INPUTS = {
+    "details_collected": "guardian_name: Ana Lopez",
+    "conversation_context": "agent: Hi, this is Alex from Sunny Meadows. Who am I speaking with?\ncustomer: Hi, my name is Ana Lopez.",
+    "conversation_stage": "collecting_pet_details"
+}
+
+def instant_llm():
+    from crewai.llms.base_llm import BaseLLM
+
+    class InstantLLM(BaseLLM):
+        def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+            return f"Thought: I now can give a great answer\nFinal Answer: {REPLY}"
+
+    return InstantLLM(model="instant", temperature=0)
+
+def mock_openai_client():
+    import httpx
+    from openai import AsyncOpenAI
+
+    def answer(request):
+        return httpx.Response(200, json={
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": REPLY}}],
+            "usage": {"prompt_tokens": 600, "completion_tokens": 20, "total_tokens": 620}
+        })
+
+    return AsyncOpenAI(http_client=httpx.AsyncClient(transport=httpx.MockTransport(answer)))
+
+@contextlib.contextmanager
+def stdout_discarded():
+    # crewai's console keeps its own handle on stdout, so swap the file descriptor itself
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+def crew_paths(agent):
+    from crewai import Crew, Task
+    from tasks import CONFIRMATION_TASK
+    task = Task(**CONFIRMATION_TASK, agent=agent)
+    reused = Crew(agents=[agent], tasks=[task], verbose=False)
+
+    # crewai prints its progress panels for every kickoff (whatever the crew's
+    # verbose flag says); the printing is part of what a kickoff costs
+    def crew_per_webhook():
+        with stdout_discarded():
+            return Crew(agents=[agent], tasks=[task], verbose=True).kickoff(inputs=INPUTS).raw
+
+    def reused_crew():
+        with stdout_discarded():
+            return reused.kickoff(inputs=INPUTS).raw
+
+    return crew_per_webhook, reused_crew
+
+def async_client_path(agent):
+    import completions
+    from tasks import CONFIRMATION_TASK
+    completions._client = mock_openai_client()
+    loop = asyncio.new_event_loop()
+
+    def async_client():
+        messages = completions.build_messages(agent, CONFIRMATION_TASK, INPUTS)
+        text, _ = loop.run_until_complete(completions.complete(messages, "gpt-4o", 0.8))
+        return text
+
+    return async_client
+
+def per_turn_us(turn, turns, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(turns):
+            turn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / turns * 1e6, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50, help="turns timed per repeat")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from agents import get_vet_appointment_agent
+    from routing import LARGE_MODEL
+    agent = get_vet_appointment_agent(LARGE_MODEL)
+    # Only the crews call the agent's LLM; the async path just reads its role
+    agent.llm = instant_llm()
+    agent.verbose = False
+
+    crew_per_webhook, reused_crew = crew_paths(agent)
+    paths = {"crew_per_webhook": crew_per_webhook, "reused_crew": reused_crew, "async_client": async_client_path(agent)}
+    for name, turn in paths.items():
+        reply = turn()
+        if reply != REPLY:
+            raise AssertionError(f"{name} replied {reply!r}")
+
+    report = {name: {"us_per_turn": per_turn_us(turn, args.turns, args.repeat)} for name, turn in paths.items()}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Worker scaling benchmark: turns per second as uvicorn goes from 1 to N worker processes.
+
+Serves the app with `uvicorn --workers N` on one shared call-state file
+(CONVERSATION_STORE=shared), each worker with replay.py's fake LLMs and Twilio
+client, and replays the same synthetic calls over HTTP at a fixed concurrency.
+The kernel hands each connection to whichever worker accepts it first, so the
+webhooks of one call are served by several workers. Replay's default model
+latencies are short enough that one worker is CPU-bound; throughput can only
+scale up to the number of cores:
+
+    python bench_workers.py --output workers.json
+    python bench_workers.py --workers 1,2,4,8 --calls 400 --concurrency 100
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from types import SimpleNamespace
+
+from bench_dashboard import free_port
+
+# Everything fake_app needs to build the same fakes in every worker
+OPTIONS = ["calls", "seed", "reply_latency", "extraction_latency", "small_reply_latency",
+           "small_extraction_latency", "small_error_rate", "ms_per_1k_prompt_tokens"]
+
+def fake_app():
+    """The app with replay's fakes, built in each uvicorn worker (uvicorn --factory)"""
+    import replay
+    # replay points the store at a fresh file of its own; every worker must open the same one
+    os.environ["CONVERSATION_STORE"] = "shared"
+    os.environ["CONVERSATION_DB"] = os.environ["BENCH_WORKERS_DB"]
+    args = SimpleNamespace(**json.loads(os.environ["BENCH_WORKERS_OPTIONS"]))
+    api, _ = replay.install_fakes(replay.synthetic_scripts(args.calls, args.seed), args)
+    return api.app
+
+def wait_until_ready(base_url, server, timeout=120):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn did not come up")
+
+async def drive(base_url, scripts, workers, concurrency, seed):
+    import httpx
+    from metrics import LatencyRecorder
+    from replay import replay_call
+
+    # One connection per warm-up request, so they spread over the workers
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=httpx.Limits(max_keepalive_connections=0)) as http:
+        await asyncio.gather(*[http.get("/ready", params={"warm": 1}) for _ in range(4 * workers)])
+
+    turn_latency = LatencyRecorder(max_samples=1000000)
+    rng = random.Random(seed)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded(http, script):
+        async with slots:
+            return await replay_call(http, script, turn_latency, {}, 0.0, rng)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=httpx.Limits(max_connections=concurrency)) as http:
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*[bounded(http, script) for script in scripts])
+        elapsed = time.perf_counter() - started
+    return outcomes, turn_latency, elapsed
+
+def run_level(workers, args):
+    from replay import synthetic_scripts, accuracy
+    here = os.path.dirname(os.path.abspath(__file__))
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    pool_size = str(2 * args.concurrency + 16)
+    with tempfile.TemporaryDirectory(prefix="workers-") as tmp:
+        env = {
+            **os.environ,
+            "BENCH_WORKERS_DB": os.path.join(tmp, "conversations.db"),
+            "BENCH_WORKERS_OPTIONS": json.dumps({option: getattr(args, option) for option in OPTIONS}),
+            "LLM_POOL_SIZE": pool_size,
+            "TWILIO_POOL_SIZE": pool_size,
+            "STORE_POOL_SIZE": pool_size
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "bench_workers:fake_app", "--factory", "--workers", str(workers),
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=here, env=env, stdout=subprocess.DEVNULL
+        )
+        try:
+            wait_until_ready(base_url, server)
+            scripts = synthetic_scripts(args.calls, args.seed)
+            outcomes, turn_latency, elapsed = asyncio.run(drive(base_url, scripts, workers, args.concurrency, args.seed))
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait(timeout=60)
+
+    turns = sum(outcome["turns"] for outcome in outcomes)
+    return {
+        "turns": turns,
+        "elapsed_seconds": round(elapsed, 3),
+        "turns_per_second": round(turns / elapsed, 2),
+        "turn_latency_ms": {
+            "p50": round(turn_latency.percentile(50) * 1000, 2),
+            "p95": round(turn_latency.percentile(95) * 1000, 2)
+        },
+        "concluded_fraction": round(sum(outcome["concluded"] for outcome in outcomes) / len(outcomes), 4),
+        # Turns of one call ran on different workers; the details must still add up
+        "calls_fully_correct": accuracy(outcomes)["calls_fully_correct"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated uvicorn worker counts")
+    parser.add_argument("--calls", type=int, default=200, help="synthetic calls replayed at each worker count")
+    parser.add_argument("--concurrency", type=int, default=50, help="calls in flight at once")
+    parser.add_argument("--reply-latency", default="50,150", help="fake reply LLM latency as median,p95 in ms")
+    parser.add_argument("--extraction-latency", default="40,120", help="fake extraction LLM latency as median,p95 in ms")
+    parser.add_argument("--small-reply-latency", default="25,80", help="fake reply latency of the small model, median,p95 in ms")
+    parser.add_argument("--small-extraction-latency", default="20,60", help="fake extraction latency of the small model, median,p95 in ms")
+    parser.add_argument("--small-error-rate", type=float, default=0.1, help="share of the small model's extractions that fail validation")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here instead of to stdout")
+    args = parser.parse_args()
+    args.ms_per_1k_prompt_tokens = 0.0
+
+    levels = [int(level) for level in args.workers.split(",")]
+    report = {"cpu_count": os.cpu_count(), "calls": args.calls, "concurrency": args.concurrency, "workers": {}}
+    for workers in levels:
+        report["workers"][workers] = run_level(workers, args)
+        print(f"{workers} workers: {report['workers'][workers]['turns_per_second']} turns/s", file=sys.stderr)
+
+    first = report["workers"][levels[0]]["turns_per_second"]
+    for workers in levels:
+        report["workers"][workers]["speedup"] = round(report["workers"][workers]["turns_per_second"] / first, 2)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
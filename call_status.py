@@ -0,0 +1,51 @@
+import time
+import asyncio
+from collections import OrderedDict
+from events import TERMINAL_STATUSES
+
+class CallStatusCache:
+    """Latest known status per call, kept current by Twilio status callbacks.
+
+    A miss (or an in-progress status older than the TTL, in case a callback was
+    lost) falls back to `fetch`. Concurrent misses for the same call share a
+    single fetch. Terminal statuses never change, so they only leave the cache
+    through LRU eviction.
+    """
+    def __init__(self, fetch, max_size=10000, ttl_seconds=30):
+        self._fetch = fetch
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0}
+
+    def set(self, call_sid, status):
+        self._entries[call_sid] = (status, time.monotonic())
+        self._entries.move_to_end(call_sid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, call_sid):
+        entry = self._entries.get(call_sid)
+        if entry is not None:
+            status, stored_at = entry
+            if status in TERMINAL_STATUSES or time.monotonic() - stored_at < self.ttl_seconds:
+                self._entries.move_to_end(call_sid)
+                self.stats["hits"] += 1
+                return status
+
+        self.stats["misses"] += 1
+        fetch = self._inflight.get(call_sid)
+        if fetch is None:
+            fetch = self._inflight[call_sid] = asyncio.ensure_future(self._load(call_sid))
+        # Shielded so one caller giving up doesn't cancel the fetch for the others
+        return await asyncio.shield(fetch)
+
+    async def _load(self, call_sid):
+        try:
+            self.stats["fetches"] += 1
+            status = await self._fetch(call_sid)
+            self.set(call_sid, status)
+            return status
+        finally:
+            self._inflight.pop(call_sid, None)
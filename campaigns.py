@@ -0,0 +1,159 @@
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from events import TERMINAL_STATUSES
+
+# Outcomes worth dialling again
+RETRY_STATUSES = ["no-answer", "busy", "failed"]
+
+class RateLimiter:
+    """Spaces out calls so no more than `per_second` start in any one second"""
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_slot - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_slot = max(self._next_slot, loop.time()) + self.interval
+
+class CampaignDispatcher:
+    """Dials batches of numbers with a calls-per-second limit and a cap on live calls.
+
+    `place_call(phone_number, details)` starts one call and returns its CallSid;
+    `get_status(call_sid)` looks up a call's status when no callback has arrived
+    in a while. Both are injected so a fake Twilio client can drive the dispatcher.
+
+    Finished campaigns stay readable for `ttl_seconds`, and only the newest
+    `max_campaigns` of them are kept; running campaigns are never dropped.
+    """
+    def __init__(self, place_call, get_status, calls_per_second=1.0, max_concurrent=10,
+                 max_attempts=3, backoff_seconds=60, status_poll_seconds=60, call_timeout_seconds=1800,
+                 max_campaigns=1000, ttl_seconds=24 * 60 * 60):
+        self._place_call = place_call
+        self._get_status = get_status
+        self.rate = RateLimiter(calls_per_second)
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.status_poll_seconds = status_poll_seconds
+        self.call_timeout_seconds = call_timeout_seconds
+        self.max_campaigns = max_campaigns
+        self.ttl_seconds = ttl_seconds
+        self.campaigns = OrderedDict()
+        # campaign id -> dials still running
+        self._running = {}
+        self._slots = None
+        self._waiting = {}
+        self._tasks = set()
+
+    def create(self, calls):
+        """Start a campaign for [{"phone_number": ..., "details": {...}}, ...] and return it"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        campaign = {
+            "id": uuid.uuid4().hex,
+            "created_at": time.time(),
+            "calls": [
+                {
+                    "phone_number": call["phone_number"],
+                    "details": call.get("details") or {},
+                    "status": "queued",
+                    "attempts": 0,
+                    "call_sid": None,
+                    "error": None
+                }
+                for call in calls
+            ]
+        }
+        self._evict()
+        self.campaigns[campaign["id"]] = campaign
+        self._running[campaign["id"]] = len(campaign["calls"])
+        for entry in campaign["calls"]:
+            task = asyncio.create_task(self._run_dial(campaign["id"], entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return campaign
+
+    def on_status(self, call_sid, status):
+        """Feed in a Twilio status callback; terminal statuses release the waiting dial"""
+        waiter = self._waiting.get(call_sid)
+        if waiter and status in TERMINAL_STATUSES and not waiter.done():
+            waiter.set_result(status)
+
+    def progress(self, campaign_id):
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+        counts = {}
+        for entry in campaign["calls"]:
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        done = sum(1 for entry in campaign["calls"] if entry["status"] in TERMINAL_STATUSES + ["error"])
+        return {
+            "id": campaign_id,
+            "total": len(campaign["calls"]),
+            "done": done,
+            "counts": counts,
+            "calls": campaign["calls"]
+        }
+
+    def _evict(self):
+        now = time.time()
+        for campaign_id, campaign in list(self.campaigns.items()):
+            if self._running.get(campaign_id):
+                continue
+            if len(self.campaigns) >= self.max_campaigns or now - campaign["created_at"] >= self.ttl_seconds:
+                del self.campaigns[campaign_id]
+                self._running.pop(campaign_id, None)
+
+    async def _run_dial(self, campaign_id, entry):
+        try:
+            await self._dial(entry)
+        finally:
+            self._running[campaign_id] -= 1
+
+    async def _dial(self, entry):
+        while entry["attempts"] < self.max_attempts:
+            if entry["attempts"]:
+                entry["status"] = "retry-scheduled"
+                await asyncio.sleep(self.backoff_seconds * 2 ** (entry["attempts"] - 1))
+
+            async with self._slots:
+                await self.rate.wait()
+                entry["attempts"] += 1
+                entry["status"] = "dialing"
+                try:
+                    entry["call_sid"] = await self._place_call(entry["phone_number"], entry["details"])
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                    continue
+                entry["status"] = "in-progress"
+                entry["status"] = await self._wait_for_end(entry["call_sid"])
+
+            if entry["status"] not in RETRY_STATUSES:
+                return
+
+    async def _wait_for_end(self, call_sid):
+        waiter = self._waiting[call_sid] = asyncio.get_running_loop().create_future()
+        deadline = time.monotonic() + self.call_timeout_seconds
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(waiter), timeout=self.status_poll_seconds)
+                except asyncio.TimeoutError:
+                    # No callback yet; it may have been lost or beaten us here
+                    try:
+                        status = await self._get_status(call_sid)
+                    except Exception:
+                        continue
+                    if status in TERMINAL_STATUSES:
+                        return status
+            return "error"
+        finally:
+            del self._waiting[call_sid]
@@ -0,0 +1,51 @@
+import re
+
+# A crewai kickoff is synchronous and mostly Python work, so concurrent kickoffs on
+# threads queue for the GIL and every webhook slows down with the number of calls.
+# Turns call OpenAI's async client directly instead; the agents and task dicts
+# only supply the prompts, and a turn waiting on the model holds no thread at all.
+
+# {name} placeholders in a task description; other braces (the JSON examples in
+# the extraction prompts) are left alone
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+_client = None
+
+def openai_client():
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI()
+    return _client
+
+def build_messages(agent, task, inputs):
+    """An agent's role, goal and backstory and a task prompt with its inputs filled in, as chat messages"""
+    description = PLACEHOLDER.sub(lambda match: str(inputs.get(match.group(1), match.group(0))), task["description"])
+    system = f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"
+    user = f"{description}\n\nThis is the expected criteria for your final answer: {task['expected_output']}"
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user}
+    ]
+
+def usage_of(usage):
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens
+    }
+
+async def complete(messages, model, temperature, response_format=None):
+    """One chat completion; returns the reply text and its token usage.
+
+    A `response_format` (e.g. a strict JSON schema) constrains what the model can return.
+    """
+    options = {"response_format": response_format} if response_format else {}
+    response = await openai_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        **options
+    )
+    usage = usage_of(response.usage) if response.usage else {}
+    return (response.choices[0].message.content or "").strip(), usage
@@ -0,0 +1,82 @@
+import re
+from functools import lru_cache
+
+WORD = re.compile(r"\S+")
+
+@lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+        # gpt-4o's tokenizer; fetching it needs network access the first time
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+def count_tokens(text):
+    """Tokens in `text` by the local tokenizer, or roughly four characters a token without it"""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+def _clip(text, words):
+    found = WORD.findall(text)
+    return " ".join(found[:words]) + (" ..." if len(found) > words else "")
+
+class ContextBuilder:
+    """Bounded conversation context for the reply prompt.
+
+    The last `window_turns` exchanges are kept verbatim. Anything older is folded
+    into a short rolling summary that is only rebuilt every `summary_every`
+    exchanges or when the stage changes, so between refreshes the prompt prefix
+    stays the same. The whole section is held to `max_tokens`.
+    """
+    def __init__(self, window_turns=6, summary_every=4, max_tokens=1200, summary_max_tokens=200):
+        self.window_messages = 2 * window_turns
+        self.summary_every_messages = 2 * summary_every
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+
+    def build(self, transcript, stage, cache):
+        """The context text and its token count; `cache` is a per-call dict that carries the summary between turns"""
+        window_start = max(0, len(transcript) - self.window_messages)
+        upto = cache.get("upto", 0)
+        stale = window_start - upto >= self.summary_every_messages or cache.get("stage") != stage
+        if stale and window_start > upto:
+            cache["summary"] = self.summarise(transcript.messages(0, window_start))
+            cache["upto"] = upto = window_start
+        cache["stage"] = stage
+
+        summary = cache.get("summary", "")
+        lines = [f"{msg.role}: {msg.content}" for msg in transcript.messages(upto)]
+        tokens = [count_tokens(line) for line in lines]
+        summary_tokens = count_tokens(summary) if summary else 0
+
+        # Over budget: drop the oldest verbatim lines first, but always keep the latest exchange
+        while len(lines) > 2 and summary_tokens + sum(tokens) > self.max_tokens:
+            lines.pop(0)
+            tokens.pop(0)
+        if summary and summary_tokens + sum(tokens) > self.max_tokens:
+            summary, summary_tokens = "", 0
+
+        text = "\n".join(([summary] if summary else []) + lines)
+        return text, summary_tokens + sum(tokens)
+
+    def summarise(self, messages):
+        """A deterministic digest of what the customer said in `messages`, newest remarks first to survive"""
+        remarks = [_clip(msg.content, 15) for msg in messages if msg.role == "customer"]
+        kept = []
+        used = 0
+        for remark in reversed(remarks):
+            cost = count_tokens(remark) + 2
+            if used + cost > self.summary_max_tokens:
+                break
+            kept.append(remark)
+            used += cost
+        kept.reverse()
+
+        text = f"(Summary of the first {len(messages)} messages) The customer said: " + "; ".join(f'"{remark}"' for remark in kept)
+        omitted = len(remarks) - len(kept)
+        if omitted:
+            text += f" - plus {omitted} earlier remarks, already reflected in the details collected."
+        return text
@@ -0,0 +1,59 @@
+import json
+import asyncio
+import threading
+
+TERMINAL_STATUSES = ["completed", "canceled", "failed", "no-answer", "busy"]
+
+class EventBroker:
+    """Fans per-call events (messages, state changes, call status) out to subscribed dashboards.
+
+    Events can be published from any thread; they are delivered on the event loop
+    that the subscribers live on.
+    """
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, call_sid):
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(call_sid, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, call_sid, queue):
+        with self._lock:
+            queues = self._subscribers.get(call_sid)
+            if queues:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[call_sid]
+
+    def publish(self, call_sid, event_type, data):
+        with self._lock:
+            if call_sid not in self._subscribers:
+                return
+        event = {"type": event_type, "data": data}
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._deliver(call_sid, event)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, call_sid, event)
+
+    def _deliver(self, call_sid, event):
+        with self._lock:
+            queues = list(self._subscribers.get(call_sid, ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A dashboard that stopped reading shouldn't hold up the call
+                pass
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
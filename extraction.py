@@ -0,0 +1,389 @@
+import re
+
+# Same species list the extraction validator accepts
+SPECIES = ["dog", "cat", "bird", "rabbit", "hamster", "fish", "reptile"]
+
+SPECIES_ALIASES = {
+    "puppy": "dog", "pup": "dog", "doggy": "dog",
+    "kitten": "cat", "kitty": "cat",
+    "bunny": "rabbit",
+    "parrot": "bird", "budgie": "bird", "cockatiel": "bird", "canary": "bird",
+    "lizard": "reptile", "snake": "reptile", "turtle": "reptile", "tortoise": "reptile", "gecko": "reptile",
+    "goldfish": "fish"
+}
+
+# Breed gazetteer: spoken form -> (species, canonical breed name)
+BREEDS = {
+    "german shepherd": ("dog", "German Shepherd"),
+    "golden retriever": ("dog", "Golden Retriever"),
+    "labrador retriever": ("dog", "Labrador Retriever"),
+    "labrador": ("dog", "Labrador"),
+    "lab": ("dog", "Labrador"),
+    "beagle": ("dog", "Beagle"),
+    "poodle": ("dog", "Poodle"),
+    "french bulldog": ("dog", "French Bulldog"),
+    "bulldog": ("dog", "Bulldog"),
+    "boxer": ("dog", "Boxer"),
+    "dachshund": ("dog", "Dachshund"),
+    "chihuahua": ("dog", "Chihuahua"),
+    "siberian husky": ("dog", "Siberian Husky"),
+    "husky": ("dog", "Husky"),
+    "rottweiler": ("dog", "Rottweiler"),
+    "shih tzu": ("dog", "Shih Tzu"),
+    "pug": ("dog", "Pug"),
+    "border collie": ("dog", "Border Collie"),
+    "corgi": ("dog", "Corgi"),
+    "great dane": ("dog", "Great Dane"),
+    "yorkshire terrier": ("dog", "Yorkshire Terrier"),
+    "yorkie": ("dog", "Yorkshire Terrier"),
+    "cocker spaniel": ("dog", "Cocker Spaniel"),
+    "doberman": ("dog", "Doberman"),
+    "pomeranian": ("dog", "Pomeranian"),
+    "maltese": ("dog", "Maltese"),
+    "bengal": ("cat", "Bengal"),
+    "siamese": ("cat", "Siamese"),
+    "persian": ("cat", "Persian"),
+    "maine coon": ("cat", "Maine Coon"),
+    "ragdoll": ("cat", "Ragdoll"),
+    "sphynx": ("cat", "Sphynx"),
+    "british shorthair": ("cat", "British Shorthair"),
+    "domestic shorthair": ("cat", "Domestic Shorthair"),
+    "scottish fold": ("cat", "Scottish Fold"),
+    "abyssinian": ("cat", "Abyssinian"),
+    "russian blue": ("cat", "Russian Blue"),
+    "holland lop": ("rabbit", "Holland Lop"),
+    "netherland dwarf": ("rabbit", "Netherland Dwarf"),
+    "cockatiel": ("bird", "Cockatiel"),
+    "budgie": ("bird", "Budgerigar")
+}
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "fifteen": 15, "eighteen": 18
+}
+
+# Words that follow "my name is", "it's" etc. but are not names
+NOT_NAMES = {
+    "a", "an", "the", "good", "fine", "great", "ok", "okay", "sure", "yes", "yeah", "yep", "no",
+    "not", "here", "calling", "doing", "sorry", "just", "well", "looking", "hi", "hello", "hey",
+    "thanks", "thank", "correct", "right", "that", "this", "it", "he", "she", "my", "his", "her",
+    "dog", "cat", "bird", "fish", "rabbit", "hamster", "reptile", "about", "going", "on", "at",
+    "for", "in", "free", "available", "confirming", "happy", "glad", "bye", "goodbye",
+    "afraid", "unsure", "busy", "wondering", "really", "actually", "but", "and", "so", "from",
+    "with", "speaking", "i", "is", "was", "also", "too", "please", "maybe", "probably"
+}
+
+AFFIRMATIONS = re.compile(r"\b(yes|yeah|yep|yup|correct|that'?s right|sounds good|perfect|confirm(?:ed)?|all good|great)\b")
+# Anything that hedges, corrects or asks for a change is left to the extraction agent
+NEGATIONS = re.compile(
+    r"\b(no|not|nope|wrong|actually|change|instead|incorrect|mistake|but|move|moved|reschedule|"
+    r"cancel|afraid|sorry|unsure|maybe|perhaps|wait|hold on|rather|think|don'?t|can'?t|won'?t|isn'?t|"
+    r"wasn'?t|can we|could we|can you|could you)\b"
+)
+
+# Words that carry no detail of their own; every other word of a turn must be
+# explained by a match before the fast tier can claim it
+FILLER_WORDS = {
+    "hi", "hello", "hey", "good", "morning", "afternoon", "evening", "yes", "yeah", "yep", "yup", "sure",
+    "ok", "okay", "oh", "um", "uh", "so", "well", "and", "the", "a", "an", "is", "it", "it's", "its",
+    "my", "our", "his", "her", "their", "he", "she", "he's", "she's", "they", "name", "name's", "called",
+    "named", "pet", "pet's", "born", "on", "in", "at", "of", "old", "thanks", "thank", "you", "please",
+    "that", "that's", "right", "correct", "perfect", "great", "sounds", "all", "this", "me", "call", "was",
+    "appointment", "visit", "booked", "scheduled", "for", "confirm", "confirmed", "around", "about"
+}
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9':]*")
+
+# Up to three words; clean_name() trims off whatever follows the name itself
+_NAME = r"([a-z][a-z'-]+(?:\s+[a-z][a-z'-]+){0,2})"
+_MONTH = r"(" + "|".join(m[:3] + r"(?:" + m[3:] + r")?" for m in MONTHS) + r")\.?"
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+# Only an explicit cue introduces the guardian; "I'm afraid..." is not a name
+GUARDIAN_RE = re.compile(r"\b(?:my name is|my name's|this is|call me)\s+" + _NAME)
+PET_NAME_RE = re.compile(
+    r"\b(?:(?:pet|dog|cat|bird|rabbit|puppy|kitten)'?s name is|(?:his|her|its) name is|(?:he|she|it)'?s called|(?:he|she|it) is called|named)\s+" + _NAME
+    + r"|\b([a-z][a-z'-]+) is my (?:pet|dog|cat|bird|rabbit|puppy|kitten)\b"
+)
+GENERIC_NAME_RE = re.compile(r"^(?:(?:it'?s|it is|name is|the name is)\s+)?" + _NAME + r"[.!]?$")
+SPECIES_RE = re.compile(r"\b(" + "|".join(SPECIES + sorted(SPECIES_ALIASES)) + r")s?\b")
+BREED_RE = re.compile(r"\b(" + "|".join(re.escape(b) for b in sorted(BREEDS, key=len, reverse=True)) + r")s?\b")
+AGE_RE = re.compile(r"\b" + _NUMBER + r"(?:\s+and a half)?\s+(year|month|week)s?\s+old\b")
+BORN_RE = re.compile(r"\bborn (?:on |in )?([^.,!?]+)")
+MONTH_DAY_RE = re.compile(r"\b" + _MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b")
+DAY_MONTH_RE = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+of\s+" + _MONTH)
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2}/\d{1,2}(?:/\d{2,4})?)\b")
+RELATIVE_DATE_RE = re.compile(
+    r"\b(today|tomorrow|day after tomorrow|(?:this |next )?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday))\b"
+)
+TIME_RE = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*([ap])\.?\s?m\b\.?|\b(\d{1,2}):(\d{2})\b|\b(noon|midday)\b")
+YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+# Fields the confirmation flow asks for, in the order it asks for them
+FIELD_GROUPS = [
+    ("collecting_guardian", ["guardian_name"]),
+    ("collecting_pet_details", ["pet_name", "pet_dob", "pet_species", "pet_breed"]),
+    ("collecting_appointment", ["appointment_date", "appointment_time"])
+]
+
+def awaited_fields(details):
+    """Missing fields of the first incomplete group, i.e. what the agent is asking for now"""
+    for _, fields in FIELD_GROUPS:
+        missing = [field for field in fields if not details.get(field)]
+        if missing:
+            return missing
+    return []
+
+def infer_stage(details):
+    if not any(details.get(field) for _, fields in FIELD_GROUPS for field in fields):
+        return "greeting"
+    for stage, fields in FIELD_GROUPS:
+        if any(not details.get(field) for field in fields):
+            return stage
+    return "confirming"
+
+def clean_name(raw):
+    """The name at the start of `raw`, title-cased, or None if it doesn't start with one"""
+    words = []
+    for word in raw.split():
+        if word in NOT_NAMES or word in BREEDS or SPECIES_RE.fullmatch(word):
+            break
+        words.append(word)
+    return " ".join(word.capitalize() for word in words) or None
+
+def normalize_time(hour, minute=None, meridiem=None):
+    minute = minute or "00"
+    if meridiem:
+        return f"{int(hour)}:{minute} {meridiem.upper()}M"
+    return f"{int(hour)}:{minute}"
+
+def normalize_date(text):
+    """Normalise a spoken date to "March 5" style where we can, otherwise tidy it up"""
+    text = text.strip()
+    match = MONTH_DAY_RE.search(text)
+    if match:
+        date = f"{_month_name(match.group(1))} {int(match.group(2))}"
+    else:
+        match = DAY_MONTH_RE.search(text)
+        if match:
+            date = f"{_month_name(match.group(2))} {int(match.group(1))}"
+        else:
+            return text.title()
+    year = YEAR_RE.search(text)
+    return f"{date}, {year.group(1)}" if year else date
+
+def _month_name(prefix):
+    prefix = prefix.lower().rstrip(".")[:3]
+    return next(month for month in MONTHS if month.startswith(prefix)).capitalize()
+
+def _age(number, unit):
+    count = NUMBER_WORDS.get(number, None) or int(number)
+    return f"{count} {unit}{'s' if count != 1 else ''} old"
+
+class FastResult:
+    def __init__(self, fields, ambiguous=False, reason="", resolved=False):
+        self.fields = fields
+        self.ambiguous = ambiguous
+        self.reason = reason
+        self.resolved = resolved
+
+class FastExtractor:
+    """Deterministic first tier: patterns, a breed gazetteer and date/time normalisers.
+
+    A turn only counts as resolved when every word in it is explained by a match,
+    a detail we already hold, or filler, and nothing in it hedges or asks for a
+    change; anything else goes to the extraction agent.
+    """
+
+    def extract(self, utterance, details):
+        text = utterance.lower().strip()
+        awaited = awaited_fields(details)
+        found = {}
+        candidates = {}
+        spans = []
+
+        def add(field, value, start, end):
+            candidates.setdefault(field, set()).add(value)
+            spans.append((start, end))
+
+        def add_name(field, match, group):
+            name = clean_name(match.group(group))
+            if name:
+                start = match.start(group)
+                add(field, name, start, start + len(name))
+
+        for match in GUARDIAN_RE.finditer(text):
+            add_name("guardian_name", match, 1)
+        for match in PET_NAME_RE.finditer(text):
+            add_name("pet_name", match, 1 if match.group(1) else 2)
+
+        # A bare "Sarah Connor." or "it's Sarah" answers whichever name we're asking for
+        match = GENERIC_NAME_RE.match(text)
+        if match and awaited and awaited[0] in ("guardian_name", "pet_name"):
+            add_name(awaited[0], match, 1)
+
+        for match in BREED_RE.finditer(text):
+            species, breed = BREEDS[match.group(1)]
+            add("pet_breed", breed, *match.span())
+            add("pet_species", species, *match.span())
+        for match in SPECIES_RE.finditer(text):
+            word = match.group(1)
+            add("pet_species", SPECIES_ALIASES.get(word, word), *match.span())
+
+        for match in AGE_RE.finditer(text):
+            add("pet_dob", _age(match.group(1), match.group(2)), *match.span())
+        born = BORN_RE.search(text)
+        if born:
+            add("pet_dob", normalize_date(born.group(1)), *born.span())
+
+        # Dates not introduced by "born" belong to the appointment
+        dated_text = text[:born.start()] + " " * (born.end() - born.start()) + text[born.end():] if born else text
+        for regex in (MONTH_DAY_RE, DAY_MONTH_RE, NUMERIC_DATE_RE, RELATIVE_DATE_RE):
+            for match in regex.finditer(dated_text):
+                add("appointment_date", normalize_date(match.group(0)), *match.span())
+        for match in TIME_RE.finditer(text):
+            if match.group(6):
+                add("appointment_time", "12:00 PM", *match.span())
+            elif match.group(1):
+                add("appointment_time", normalize_time(match.group(1), match.group(2), match.group(3)), *match.span())
+            else:
+                add("appointment_time", normalize_time(match.group(4), match.group(5)), *match.span())
+
+        for field, values in candidates.items():
+            if len(values) > 1:
+                return FastResult(found, ambiguous=True, reason=f"several values for {field}")
+            value = values.pop()
+            current = details.get(field)
+            if current and str(current).lower() != value.lower():
+                return FastResult(found, ambiguous=True, reason=f"{field} differs from collected value")
+            if not current:
+                found[field] = value
+
+        merged = {**details, **found}
+        if (merged.get("guardian_name") and merged.get("pet_name") and
+            merged["guardian_name"].lower() == merged["pet_name"].lower()):
+            return FastResult(found, ambiguous=True, reason="guardian and pet names match")
+
+        if NEGATIONS.search(text):
+            return FastResult(found, reason="hedge or change request")
+        unexplained = self._unexplained(text, spans, merged)
+        if unexplained:
+            return FastResult(found, reason=f"unexplained words: {' '.join(unexplained[:3])}")
+
+        if awaited:
+            resolved = any(field in found for field in awaited)
+        else:
+            # Everything is collected; a plain "yes, that's right" needs no LLM
+            resolved = not found and bool(AFFIRMATIONS.search(text))
+        return FastResult(found, resolved=resolved, reason="" if resolved else "nothing found for awaited field")
+
+    def _unexplained(self, text, spans, details):
+        # Values we hold may be repeated ("Biscuit is a beagle")
+        known = {word for value in details.values() if isinstance(value, str) for word in value.lower().split()}
+        unexplained = []
+        for match in WORD_RE.finditer(text):
+            word = match.group(0).rstrip("'")
+            if word in FILLER_WORDS or word in known:
+                continue
+            if any(start < match.end() and match.start() < end for start, end in spans):
+                continue
+            unexplained.append(word)
+        return unexplained
+
+# Fallback patterns used when LLM extraction fails, in priority order per field.
+# They run over lower-cased customer text.
+FALLBACK_PATTERNS = {
+    "guardian_name": [
+        r"my name is (\w+)", 
+        r"it'?s (\w+)", 
+        r"i'?m (\w+)",
+        r"this is (\w+)",
+        r"you can call me (\w+)",
+        r"call me (\w+)"
+    ],
+    "pet_name": [
+        r"pet'?s name is (\w+)", 
+        r"name is (\w+)", 
+        r"call (?:him|her|it) (\w+)",
+        r"(\w+) is (?:my|the) (?:pet|dog|cat)",
+        r"(\w+)'s (?:appointment|visit)"
+    ],
+    "pet_species": [
+        r"it'?s a (\w+)", 
+        r"species is (\w+)", 
+        r"(\bdog\b|\bcat\b|\bbird\b|\bfish\b|\bhamster\b|\brabbit\b)",
+        r"she'?s a (\w+)",
+        r"he'?s a (\w+)"
+    ],
+    "pet_breed": [
+        r"breed is ([^.,!?]*)", 
+        r"(\w+(?:\s+\w+)*) breed",
+        r"she'?s a ([^.,!?]*)",
+        r"he'?s a ([^.,!?]*)",
+        r"(\bGerman Shepherd\b|\bGolden Retriever\b|\bLabrador\b|\bBengal\b|\bSiamese\b|\bPersian\b)"
+    ],
+    "pet_dob": [
+        r"date of birth is ([^.,!?]*)", 
+        r"dob is ([^.,!?]*)", 
+        r"born on ([^.,!?]*)",
+        r"(\d+ months? old)",
+        r"(\d+ years? old)",
+        r"age is (\d+)"
+    ],
+    "appointment_date": [
+        r"appointment is ([^.,!?]*)", 
+        r"schedule for ([^.,!?]*)",
+        r"(\w+ \d+(?:st|nd|rd|th))",
+        r"(\d+/\d+/\d+)",
+        r"([A-Za-z]+ \d+)"
+    ],
+    "appointment_time": [
+        r"at (\d{1,2}:\d{2}\s*(?:am|pm))", 
+        r"time is (\d{1,2}:\d{2}\s*(?:am|pm))",
+        r"(\d{1,2}\s*(?:am|pm))",
+        r"(\d{1,2}:\d{2})"
+    ]
+}
+
+class FieldMatcher:
+    """One field's fallback patterns compiled into a single alternation.
+
+    Each pattern becomes a named group inside a lookahead, so a single pass
+    reports, at every position, the highest-priority pattern matching there.
+    The lowest priority seen, at its earliest position, is exactly what calling
+    re.search once per pattern in priority order would have returned first.
+    """
+    def __init__(self, patterns):
+        self.regex = re.compile("(?=" + "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(patterns)) + ")")
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        # The wrapping group closes last, so lastindex identifies the pattern;
+        # the pattern's own capture group is the one right after it
+        self.priority = {self.regex.groupindex[f"p{i}"]: i for i in range(len(patterns))}
+
+    def candidates(self, text):
+        """Captured values in pattern-priority order, the leftmost one for each pattern"""
+        best = None
+        for match in self.regex.finditer(text):
+            priority = self.priority[match.lastindex]
+            if best is None or priority < best[0]:
+                best = (priority, match.group(match.lastindex + 1))
+                if priority == 0:
+                    break
+        if best is None:
+            return
+        yield best[1].strip()
+        
+        # Only needed when the caller rejects the first value, which is rare
+        for pattern in self.patterns[best[0] + 1:]:
+            match = pattern.search(text)
+            if match:
+                yield match.group(1).strip()
+
+FALLBACK_MATCHERS = {field: FieldMatcher(patterns) for field, patterns in FALLBACK_PATTERNS.items()}
+
+def fallback_window(customer_messages, scanned):
+    """Text still to scan: the last already-scanned message (for matches across the join) plus new ones"""
+    return " ".join(customer_messages[max(0, scanned - 1):]).lower()
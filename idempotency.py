@@ -0,0 +1,60 @@
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+
+def delivery_key(call_sid, headers, form):
+    """Identify one webhook delivery so Twilio's retries of it map to the same key.
+
+    Twilio sends the same I-Twilio-Idempotency-Token on every retry. Without it,
+    fall back to the request signature, or a hash of the form, which match too.
+    """
+    token = headers.get("i-twilio-idempotency-token") or headers.get("x-twilio-signature")
+    if not token:
+        token = hashlib.sha1(repr(sorted(form.multi_items())).encode("utf-8")).hexdigest()
+    return f"{call_sid}:{token}"
+
+class WebhookDeduplicator:
+    """Collapses retried webhook deliveries onto the first one.
+
+    While the first delivery is still running, a retry waits for its response
+    instead of starting the turn (and its LLM calls) again; once it has finished,
+    retries within the TTL get the same response back. The first delivery runs
+    as its own task, so Twilio hanging up on it doesn't cancel the work the retry
+    is waiting for.
+    """
+    def __init__(self, max_size=10000, ttl_seconds=60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.stats = {"deliveries": 0, "joined_inflight": 0, "replayed": 0}
+
+    async def run(self, key, handle):
+        """The response for this delivery, from `handle()` the first time it's seen"""
+        self.stats["deliveries"] += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            response, stored_at = entry
+            if time.monotonic() - stored_at < self.ttl_seconds:
+                self.stats["replayed"] += 1
+                return response
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._run(key, handle))
+        else:
+            self.stats["joined_inflight"] += 1
+        # Shielded so one delivery giving up doesn't cancel the turn for the others
+        return await asyncio.shield(task)
+
+    async def _run(self, key, handle):
+        try:
+            response = await handle()
+            self._entries[key] = (response, time.monotonic())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return response
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,85 @@
+import os
+import uuid
+import asyncio
+from workers import store_pool
+
+LOCK_TIMEOUT_SECONDS = float(os.getenv("CALL_LOCK_TIMEOUT_SECONDS", "60"))
+
+class CallLocks:
+    """One asyncio.Lock per CallSid, created on demand and dropped when nobody holds or waits on it.
+
+    Waiters are served in arrival order, so overlapping webhooks for one call run
+    one after another in the order they came in, while different calls never wait
+    on each other. Only used from the event loop thread.
+    """
+    def __init__(self):
+        self._locks = {}
+
+    def __len__(self):
+        return len(self._locks)
+
+    async def acquire(self, call_sid):
+        entry = self._locks.get(call_sid)
+        if entry is None:
+            entry = self._locks[call_sid] = {"lock": asyncio.Lock(), "users": 0}
+        entry["users"] += 1
+        try:
+            await entry["lock"].acquire()
+        except BaseException:
+            self._drop(call_sid, entry)
+            raise
+
+    def release(self, call_sid):
+        entry = self._locks[call_sid]
+        entry["lock"].release()
+        self._drop(call_sid, entry)
+
+    def _drop(self, call_sid, entry):
+        entry["users"] -= 1
+        if not entry["users"]:
+            del self._locks[call_sid]
+
+class CallLock:
+    """Holds one CallSid for the duration of an `async with` block.
+
+    The in-process lock queues webhooks for the same call on this worker; the
+    store's lock then keeps other workers sharing the store out as well.
+    """
+    def __init__(self, store, call_sid, local_locks, timeout=LOCK_TIMEOUT_SECONDS):
+        self.store = store
+        self.call_sid = call_sid
+        self.local_locks = local_locks
+        self.timeout = timeout
+        self.owner = uuid.uuid4().hex
+
+    async def __aenter__(self):
+        await self.local_locks.acquire(self.call_sid)
+        try:
+            await self._acquire_store_lock()
+        except BaseException:
+            self.local_locks.release(self.call_sid)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self._store_call(self.store.unlock, self.call_sid, self.owner)
+        finally:
+            self.local_locks.release(self.call_sid)
+
+    async def _store_call(self, fn, *args):
+        # A shared store's lease is a SQLite write; keep it off the event loop
+        if self.store.shared:
+            return await store_pool.run(fn, *args)
+        return fn(*args)
+
+    async def _acquire_store_lock(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        delay = 0.005
+        # Poll rather than block, so waiting on a busy call never ties up a worker thread
+        while not await self._store_call(self.store.try_lock, self.call_sid, self.owner):
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Timed out waiting for the lock on call {self.call_sid}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
@@ -1,23 +1,93 @@
-import re
+import os
 import json
-from crewai import Crew, Process
-from agents import data_extraction_agent
-from tasks import data_extraction_task
+import time
+import copy
+import threading
+from agents import get_data_extraction_agent, get_vet_appointment_agent
+from tasks import DATA_EXTRACTION_TASK, INCREMENTAL_EXTRACTION_TASK
+from completions import build_messages
+from extraction import FastExtractor, FALLBACK_MATCHERS, fallback_window, infer_stage
+from metrics import LatencyRecorder, spans
+from store import create_store
+from locks import CallLock, CallLocks
+from events import EventBroker, TERMINAL_STATUSES
+from schemas import ExtractionResult, EXTRACTION_RESPONSE_FORMAT, parse_json_object
+from transcript import Transcript
+from context import ContextBuilder, count_tokens
+from routing import model_router
+
+# "incremental" sends only the turns since the last extraction plus the collected
+# details; "full" resends the whole transcript every turn
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "incremental")
+
+# Try the deterministic extractor before paying for an LLM extraction
+FAST_EXTRACTION = os.getenv("FAST_EXTRACTION", "1") == "1"
+
+# Have the API enforce the extraction JSON schema (structured outputs); turn off
+# for models that don't support it, leaving only the lenient parsing below
+STRUCTURED_EXTRACTION = os.getenv("STRUCTURED_EXTRACTION", "1") == "1"
+
+# Answered webhook deliveries remembered per call, for retries that reach another worker
+WEBHOOK_RESPONSES_KEPT = 4
+
+# "window" gives the reply agent the recent turns verbatim plus a rolling summary
+# of older ones, within a token budget; "full" sends the whole transcript every turn
+REPLY_CONTEXT = os.getenv("REPLY_CONTEXT", "window")
 
 class ConversationManager:
     def __init__(self):
-        self.conversations = {}
-        self.conversation_states = {}
-        self.data_extraction_crew = Crew(
-            agents=[data_extraction_agent],
-            tasks=[data_extraction_task],
-            process=Process.sequential,
-            verbose=False
+        # Per call: {"messages": Transcript, "state": {...}, "meta": {...}}
+        self._store = None
+        self._init_lock = threading.Lock()
+        self.call_locks = CallLocks()
+        self.events = EventBroker()
+        self._stats_lock = threading.Lock()
+        self.fast_extractor = FastExtractor()
+        self.extraction_stats = {
+            "turns": 0,
+            "resolved_without_llm": 0,
+            # LLM extraction outputs: how many the API held to the JSON schema, failed
+            # to parse, or were thrown away (unparseable or invalid) in favour of a
+            # retry or the regex fallback
+            "outputs": 0,
+            "schema_enforced": 0,
+            "parse_failures": 0,
+            "wasted": 0,
+            "latency": {"fast": LatencyRecorder(), "llm": LatencyRecorder()}
+        }
+        self.context_builder = ContextBuilder(
+            window_turns=int(os.getenv("REPLY_CONTEXT_TURNS", "6")),
+            summary_every=int(os.getenv("REPLY_SUMMARY_EVERY", "4")),
+            max_tokens=int(os.getenv("REPLY_CONTEXT_TOKENS", "1200"))
         )
+        # Conversation-context tokens sent to the reply agent, one sample per turn
+        self.context_tokens = LatencyRecorder()
+        self.call_stats = {
+            kind: {"calls": 0, "confirmed": 0, "turns": 0, "llm_calls": 0}
+            for kind in ("seeded", "unseeded")
+        }
+
+    # The store is built on first use, so importing this module stays cheap and
+    # doesn't need credentials
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._init_lock:
+                if self._store is None:
+                    self._store = create_store()
+        return self._store
+
+    def warm(self):
+        """Build everything that is otherwise built on the first call"""
+        self.store
+        for model in model_router.models:
+            get_vet_appointment_agent(model)
+            get_data_extraction_agent(model)
 
-    def initialize_conversation(self, call_sid):
-        self.conversations[call_sid] = []
-        self.conversation_states[call_sid] = {
+    def initialize_conversation(self, call_sid, details=None, response_cache=True):
+        """Start a call's record, pre-filled with any details already known about it"""
+        state = {
             "stage": "greeting",
             "details_collected": {
                 "guardian_name": "",
@@ -31,79 +101,414 @@ class ConversationManager:
             },
             "question_count": 0
         }
+        seeded = False
+        for field, value in (details or {}).items():
+            if field in state["details_collected"] and field != "appointment_confirmed" and value:
+                state["details_collected"][field] = str(value)
+                seeded = True
+        if seeded:
+            # Known details go straight to confirmation; the caller only corrects them
+            state["stage"] = infer_stage(state["details_collected"])
+        meta = {
+            "extracted_upto": 0,
+            "fallback_scanned": 0,
+            "token_usage": {},
+            "seeded": seeded,
+            # Off for calls that should always get a fresh LLM reply, e.g. for A/B runs
+            "response_cache": response_cache
+        }
+        record = {"messages": Transcript(), "state": state, "meta": meta}
+        self.store.put(call_sid, record)
+        return record
+
+    def _record(self, call_sid):
+        return self.store.get(call_sid) or self.initialize_conversation(call_sid)
+
+    def _transcript(self, record):
+        # Records read back from the durable store hold plain message dicts
+        messages = record["messages"]
+        if not isinstance(messages, Transcript):
+            messages = record["messages"] = Transcript(messages)
+        return messages
+
+    def lock_call(self, call_sid):
+        """Async context manager that serialises work on one call across workers"""
+        return CallLock(self.store, call_sid, self.call_locks)
+
+    def finish_conversation(self, call_sid):
+        """Move a call that has ended out of memory and into the durable store"""
+        record = self.store.peek(call_sid)
+        if record is not None and not record["meta"].get("counted"):
+            record["meta"]["counted"] = True
+            self.store.save(call_sid, record)
+            self._count_call(record)
+        self.store.finish(call_sid)
+
+    def _count_call(self, record):
+        turns = self._transcript(record).count("customer")
+        if not turns:
+            # Never answered, so there's nothing to compare
+            return
+        llm_calls = sum(usage["calls"] for usage in record["meta"]["token_usage"].values())
+        kind = "seeded" if record["meta"].get("seeded") else "unseeded"
+        with self._stats_lock:
+            counters = self.call_stats[kind]
+            counters["calls"] += 1
+            counters["confirmed"] += int(bool(record["state"]["details_collected"]["appointment_confirmed"]))
+            counters["turns"] += turns
+            counters["llm_calls"] += llm_calls
+
+    def get_call_stats(self):
+        """Average customer turns and LLM calls per answered call, with and without seeding"""
+        with self._stats_lock:
+            stats = {}
+            for kind, counters in self.call_stats.items():
+                calls = counters["calls"]
+                stats[kind] = {
+                    "calls": calls,
+                    "confirmed": counters["confirmed"],
+                    "avg_turns": counters["turns"] / calls if calls else None,
+                    "avg_llm_calls": counters["llm_calls"] / calls if calls else None
+                }
+        return stats
 
     def update_conversation(self, call_sid, role, content):
-        if call_sid not in self.conversations:
-            self.initialize_conversation(call_sid)
+        """Append a message; extraction of a customer turn is started separately with begin_extraction"""
+        record = self._record(call_sid)
+        self._transcript(record).append(role, content)
+        self.events.publish(call_sid, "message", {"role": role, "content": content})
+        self.store.save(call_sid, record)
+
+    def extract_details_fast(self, call_sid):
+        """Resolve the latest turn with the deterministic extractor alone.
+
+        Returns the fields it set, or None when the turn still needs extract_details.
+        """
+        if not FAST_EXTRACTION:
+            return None
+        record = self._record(call_sid)
+        before = self._snapshot(record)
+        with spans.span("fast_extraction", call_sid, record["state"]["stage"]):
+            resolved = self._try_fast_extraction(record)
+        if not resolved:
+            return None
+        with self._stats_lock:
+            self.extraction_stats["turns"] += 1
+        self.store.save(call_sid, record)
+        self._publish_changes(call_sid, record, before)
+        return {k: v for k, v in record["state"]["details_collected"].items() if v and before[1].get(k) != v}
+
+    def mark_confirmed(self, call_sid):
+        record = self._record(call_sid)
+        before = self._snapshot(record)
+        record["state"]["details_collected"]["appointment_confirmed"] = True
+        self.store.save(call_sid, record)
+        self._publish_changes(call_sid, record, before)
+
+    def set_call_status(self, call_sid, status):
+        """Record a Twilio lifecycle status for the call and tell subscribers about it"""
+        record = self.store.get(call_sid)
+        if record is not None:
+            record["meta"]["call_status"] = status
+            self.store.save(call_sid, record)
+            if status in TERMINAL_STATUSES:
+                self.finish_conversation(call_sid)
+        self.events.publish(call_sid, "status", status)
+
+    def response_cache_enabled(self, call_sid):
+        record = self.store.peek(call_sid)
+        return bool(record and record["meta"].get("response_cache", True))
+
+    def get_call_status(self, call_sid):
+        record = self.store.peek(call_sid)
+        return record["meta"].get("call_status") if record else None
+
+    def _snapshot(self, record):
+        return record["state"]["stage"], dict(record["state"]["details_collected"])
+
+    def _publish_changes(self, call_sid, record, before):
+        stage, details = before
+        state = record["state"]
+        delta = {k: v for k, v in state["details_collected"].items() if details.get(k) != v}
+        if delta:
+            self.events.publish(call_sid, "state", delta)
+        if state["stage"] != stage:
+            self.events.publish(call_sid, "stage", state["stage"])
+
+    # LLM extraction is split into steps around the model call, which the caller
+    # makes on the async client: begin_extraction returns the first request,
+    # finish_extraction takes its output and returns the next request (a retry on
+    # a larger model, or a full-context pass) until the turn is done, and
+    # fail_extraction falls back to the regex extraction when the call errors
+
+    def begin_extraction(self, call_sid):
+        """Start extraction for the latest customer turn.
+
+        Returns None when the deterministic extractor resolved it, otherwise the
+        request to send to the model.
+        """
+        record = self._record(call_sid)
+        before = self._snapshot(record)
+        with self._stats_lock:
+            self.extraction_stats["turns"] += 1
+
+        if FAST_EXTRACTION:
+            with spans.span("fast_extraction", call_sid, record["state"]["stage"]):
+                resolved = self._try_fast_extraction(record)
+            if resolved:
+                self.store.save(call_sid, record)
+                self._publish_changes(call_sid, record, before)
+                return None
+
+        request = self._extraction_request(record, EXTRACTION_MODE, model_router.extraction_model(record["state"]["stage"]))
+        request.update(
+            before=before,
+            # Turns appended while extraction runs are picked up next time
+            extracted_upto=len(self._transcript(record)),
+            started=time.perf_counter()
+        )
+        return request
+
+    def _extraction_request(self, record, mode, model):
+        details = record["state"]["details_collected"]
+        if mode == "incremental":
+            task = INCREMENTAL_EXTRACTION_TASK
+            inputs = {
+                "new_turns": self._transcript(record).context_since(record["meta"]["extracted_upto"]),
+                "current_details": json.dumps({k: v for k, v in details.items() if v}, separators=(",", ":"))
+            }
+        else:
+            task = DATA_EXTRACTION_TASK
+            inputs = {
+                "conversation_context": self._transcript(record).context,
+                "current_details": str(details)
+            }
+        agent = get_data_extraction_agent(model)
+        llm = {"model": agent.llm.model, "temperature": agent.llm.temperature}
+        if STRUCTURED_EXTRACTION:
+            llm["response_format"] = EXTRACTION_RESPONSE_FORMAT
+        return {
+            "mode": mode,
+            "model": model,
+            "stage": record["state"]["stage"],
+            "messages": build_messages(agent, task, inputs),
+            "llm": llm
+        }
+
+    def finish_extraction(self, call_sid, request, raw, usage, seconds):
+        """Apply a model's extraction output; returns the next request, or None when the turn is done"""
+        record = self._record(call_sid)
+        self._add_token_usage(record, "extraction", usage)
+        try:
+            with spans.span("json_parse", call_sid, request["stage"]):
+                extracted_data = self._parse_extraction_result(raw, "response_format" in request["llm"])
+        except ValueError as e:
+            # Unparseable or invalid; retry on the large model if this wasn't it
+            model_router.observe("extraction", request["model"], seconds, ok=False)
+            model = model_router.escalate("extraction", request["model"], "invalid_output")
+            if model is None:
+                self._fall_back(call_sid, record, request, e)
+                return None
+            self.store.save(call_sid, record)
+            return {**request, **self._extraction_request(record, request["mode"], model)}
+        model_router.observe("extraction", request["model"], seconds)
+
+        if request["mode"] == "incremental":
+            conflict = self._find_conflict(record, extracted_data)
+            if conflict:
+                # The new turns disagree with what we already hold (a correction
+                # or a mix-up); let a full-context pass settle it
+                print(f"Incremental extraction conflict ({conflict}), re-extracting with full context")
+                self.store.save(call_sid, record)
+                return {**request, **self._extraction_request(record, "full", model_router.extraction_model(record["state"]["stage"]))}
+
+        self._apply_extracted_data(record, extracted_data)
+        record["meta"]["extracted_upto"] = request["extracted_upto"]
+        self._end_extraction(call_sid, record, request)
+        return None
+
+    def fail_extraction(self, call_sid, request, error):
+        """The model call for a request raised; extract with the regex fallback instead"""
+        self._fall_back(call_sid, self._record(call_sid), request, error)
+
+    def _fall_back(self, call_sid, record, request, error):
+        print(f"Error in data extraction: {error}")
+        with spans.span("fallback_regex", call_sid, record["state"]["stage"]):
+            self._improved_fallback_extraction(record)
+        self._end_extraction(call_sid, record, request)
+
+    def _end_extraction(self, call_sid, record, request):
+        self.extraction_stats["latency"]["llm"].observe(time.perf_counter() - request["started"])
+        self.store.save(call_sid, record)
+        self._publish_changes(call_sid, record, request["before"])
+
+    def _try_fast_extraction(self, record):
+        """Resolve the turn with deterministic matching; returns False when the LLM is needed"""
+        started = time.perf_counter()
+        utterance = self._transcript(record).last("customer")
+        if not utterance:
+            return False
         
-        self.conversations[call_sid].append({"role": role, "content": content})
+        state = record["state"]
+        result = self.fast_extractor.extract(utterance, state["details_collected"])
+        self.extraction_stats["latency"]["fast"].observe(time.perf_counter() - started)
+        if not result.resolved:
+            return False
         
-        if role == "customer":
-            self._extract_details_with_agent(call_sid)
+        state["details_collected"].update(result.fields)
+        # Never move the stage backwards from one the extraction agent decided on
+        if state["stage"] not in ("confirming", "concluded"):
+            state["stage"] = infer_stage(state["details_collected"])
 
-    def _extract_details_with_agent(self, call_sid):
-        """Use the data extraction agent to analyze the conversation and extract details"""
+        # The turn is handled, so the next incremental extraction starts after it,
+        # unless an earlier customer turn is still waiting for the agent
+        transcript = self._transcript(record)
+        pending = transcript.messages(record["meta"]["extracted_upto"])
+        if sum(msg.role == "customer" for msg in pending) <= 1:
+            record["meta"]["extracted_upto"] = len(transcript)
+        with self._stats_lock:
+            self.extraction_stats["resolved_without_llm"] += 1
+        return True
+
+    def get_extraction_stats(self):
+        turns = self.extraction_stats["turns"]
+        outputs = self.extraction_stats["outputs"]
+        return {
+            "turns": turns,
+            "resolved_without_llm": self.extraction_stats["resolved_without_llm"],
+            "fraction_without_llm": round(self.extraction_stats["resolved_without_llm"] / turns, 3) if turns else 0.0,
+            "llm_outputs": {
+                "count": outputs,
+                "schema_enforced": self.extraction_stats["schema_enforced"],
+                "parse_failure_rate": round(self.extraction_stats["parse_failures"] / outputs, 3) if outputs else 0.0,
+                "wasted_call_rate": round(self.extraction_stats["wasted"] / outputs, 3) if outputs else 0.0
+            },
+            "latency": {tier: recorder.summary() for tier, recorder in self.extraction_stats["latency"].items()}
+        }
+
+    def _parse_extraction_result(self, raw, schema_enforced):
+        """Extraction data from the model's raw output"""
+        with self._stats_lock:
+            self.extraction_stats["outputs"] += 1
+            self.extraction_stats["schema_enforced"] += int(schema_enforced)
         try:
-            crew_input = {
-                "conversation_context": self.get_conversation_context(call_sid),
-                "current_details": str(self.conversation_states[call_sid]["details_collected"])
-            }
+            return self._parse_extraction_output(raw)
+        except ValueError:
+            with self._stats_lock:
+                self.extraction_stats["wasted"] += 1
+            raise
 
-            extraction_result = self.data_extraction_crew.kickoff(inputs=crew_input)
-            
-            # Try to parse the JSON response
-            try:
-                # Clean the response to extract just the JSON part
-                response_text = extraction_result.raw.strip()
-                
-                # Handle different JSON response formats
-                if '```json' in response_text:
-                    json_str = response_text.split('```json')[1].split('```')[0].strip()
-                elif '```' in response_text:
-                    json_str = response_text.split('```')[1].split('```')[0].strip()
-                elif response_text.startswith('{') and response_text.endswith('}'):
-                    json_str = response_text
-                else:
-                    # Try to find JSON object in the text
-                    json_match = re.search(r'\{[\s\S]*\}', response_text)
-                    if json_match:
-                        json_str = json_match.group()
-                    else:
-                        raise ValueError("No JSON found in response")
-                
-                extracted_data = json.loads(json_str)
-                
-                # Validate the extracted data
-                self._validate_extracted_data(extracted_data)
+    def _parse_extraction_output(self, raw):
+        try:
+            extracted_data = ExtractionResult.model_validate(parse_json_object(raw)).model_dump()
+        except ValueError as e:
+            # pydantic's ValidationError is a ValueError too
+            print(f"JSON parsing failed: {e}")
+            with self._stats_lock:
+                self.extraction_stats["parse_failures"] += 1
+            raise ValueError("Invalid JSON response from extraction agent")
+        
+        # Validate the extracted data
+        self._validate_extracted_data(extracted_data)
+        return extracted_data
+
+    def _find_conflict(self, record, extracted_data):
+        """Return the first field where an incremental result contradicts the collected details"""
+        current_details = record["state"]["details_collected"]
+        merged = dict(current_details)
+        
+        for key, value in extracted_data.get("extracted_details", {}).items():
+            if not value or not value.strip() or value.strip() == "empty":
+                continue
+            current = current_details.get(key)
+            if current and str(current).strip().lower() != value.strip().lower():
+                return key
+            merged[key] = value.strip()
+        
+        # The new values must also make sense alongside the ones we already hold
+        if (merged.get("guardian_name") and merged.get("pet_name") and
+            merged["guardian_name"].lower() == merged["pet_name"].lower()):
+            return "guardian_name/pet_name"
+        
+        return None
+
+    def _apply_extracted_data(self, record, extracted_data):
+        # Update details collected
+        state = record["state"]
+        current_details = state["details_collected"]
+        extracted_details = extracted_data.get("extracted_details", {})
+        
+        for key, value in extracted_details.items():
+            if value and value.strip() and value.strip() != "empty":
+                # Special validation for names to prevent mixing guardian and pet names
+                if key == "guardian_name" and value == current_details.get("pet_name"):
+                    continue  # Don't overwrite pet name with guardian name
+                if key == "pet_name" and value == current_details.get("guardian_name"):
+                    continue  # Don't overwrite guardian name with pet name
                 
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"JSON parsing failed: {e}")
-                raise ValueError("Invalid JSON response from extraction agent")
-            
-            # Update details collected
-            current_details = self.conversation_states[call_sid]["details_collected"]
-            extracted_details = extracted_data.get("extracted_details", {})
-            
-            for key, value in extracted_details.items():
-                if value and value.strip() and value.strip() != "empty":
-                    # Special validation for names to prevent mixing guardian and pet names
-                    if key == "guardian_name" and value == current_details.get("pet_name"):
-                        continue  # Don't overwrite pet name with guardian name
-                    if key == "pet_name" and value == current_details.get("guardian_name"):
-                        continue  # Don't overwrite guardian name with pet name
-                    
-                    current_details[key] = value.strip()
-            
-            # Update conversation stage
-            new_stage = extracted_data.get("conversation_stage")
-            if new_stage and new_stage in ["greeting", "collecting_guardian", "collecting_pet_details", 
-                                         "collecting_appointment", "confirming", "concluded"]:
-                self.conversation_states[call_sid]["stage"] = new_stage
-            
-        except Exception as e:
-            print(f"Error in data extraction: {e}")
-            # Fallback to improved extraction if AI extraction fails
-            self._improved_fallback_extraction(call_sid)
+                current_details[key] = value.strip()
+        
+        # Update conversation stage
+        new_stage = extracted_data.get("conversation_stage")
+        if new_stage and new_stage in ["greeting", "collecting_guardian", "collecting_pet_details", 
+                                     "collecting_appointment", "confirming", "concluded"]:
+            state["stage"] = new_stage
+
+    def record_token_usage(self, call_sid, kind, usage):
+        """Add one LLM call's token usage to the per-call counters"""
+        # The closing turn's usage arrives after the call finished; get() would
+        # load the finished call back into the live cache
+        record = self.store.peek(call_sid)
+        if record is None:
+            return
+        self._add_token_usage(record, kind, usage)
+        self.store.update(call_sid, record)
+
+    def _add_token_usage(self, record, kind, usage):
+        counters = record["meta"]["token_usage"].setdefault(
+            kind, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        )
+        counters["calls"] += 1
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            counters[key] += usage.get(key, 0)
+
+    def recall_webhook_response(self, call_sid, key):
+        """The TwiML already sent for this webhook delivery, if any worker answered it"""
+        record = self.store.peek(call_sid)
+        if record is None:
+            return None
+        return dict(record["meta"].get("webhook_responses", [])).get(key)
+
+    def remember_webhook_response(self, call_sid, key, body):
+        # Also written after the closing turn, so peek as in record_token_usage
+        record = self.store.peek(call_sid)
+        if record is None:
+            return
+        responses = record["meta"].setdefault("webhook_responses", [])
+        responses.append([key, body])
+        # Retries come within seconds, so only the latest few deliveries matter
+        del responses[:-WEBHOOK_RESPONSES_KEPT]
+        self.store.update(call_sid, record)
+
+    def set_continuation(self, call_sid, continuation):
+        """What /voice-continue says after a streamed first sentence: {"conclude", "rest"} or {"failed": True}"""
+        record = self.store.peek(call_sid)
+        if record is None:
+            return
+        record["meta"]["continuation"] = continuation
+        self.store.update(call_sid, record)
+
+    def pop_continuation(self, call_sid):
+        record = self.store.peek(call_sid)
+        if record is None or "continuation" not in record["meta"]:
+            return None
+        continuation = record["meta"].pop("continuation")
+        self.store.update(call_sid, record)
+        return continuation
+
+    def get_token_usage(self, call_sid):
+        record = self.store.peek(call_sid)
+        return record["meta"]["token_usage"] if record else {}
 
     def _validate_extracted_data(self, extracted_data):
         """Validate that the extracted data makes sense"""
@@ -122,99 +527,85 @@ class ConversationManager:
                 # If we already have a breed, this might be an error
                 raise ValueError(f"Invalid species: {species}")
     
-    def _improved_fallback_extraction(self, call_sid):
+    def _improved_fallback_extraction(self, record):
         """Improved fallback extraction with better pattern matching"""
-        state = self.conversation_states[call_sid]
-        conversation = self.conversations.get(call_sid, [])
-        
-        # Analyze the entire conversation for better context
-        full_text = " ".join([msg["content"] for msg in conversation if msg["role"] == "customer"])
-        full_text_lower = full_text.lower()
-        
-        # Improved patterns with better context awareness
-        patterns = {
-            "guardian_name": [
-                r"my name is (\w+)", 
-                r"it'?s (\w+)", 
-                r"i'?m (\w+)",
-                r"this is (\w+)",
-                r"you can call me (\w+)",
-                r"call me (\w+)"
-            ],
-            "pet_name": [
-                r"pet'?s name is (\w+)", 
-                r"name is (\w+)", 
-                r"call (?:him|her|it) (\w+)",
-                r"(\w+) is (?:my|the) (?:pet|dog|cat)",
-                r"(\w+)'s (?:appointment|visit)"
-            ],
-            "pet_species": [
-                r"it'?s a (\w+)", 
-                r"species is (\w+)", 
-                r"(\bdog\b|\bcat\b|\bbird\b|\bfish\b|\bhamster\b|\brabbit\b)",
-                r"she'?s a (\w+)",
-                r"he'?s a (\w+)"
-            ],
-            "pet_breed": [
-                r"breed is ([^.,!?]*)", 
-                r"(\w+(?:\s+\w+)*) breed",
-                r"she'?s a ([^.,!?]*)",
-                r"he'?s a ([^.,!?]*)",
-                r"(\bGerman Shepherd\b|\bGolden Retriever\b|\bLabrador\b|\bBengal\b|\bSiamese\b|\bPersian\b)"
-            ],
-            "pet_dob": [
-                r"date of birth is ([^.,!?]*)", 
-                r"dob is ([^.,!?]*)", 
-                r"born on ([^.,!?]*)",
-                r"(\d+ months? old)",
-                r"(\d+ years? old)",
-                r"age is (\d+)"
-            ],
-            "appointment_date": [
-                r"appointment is ([^.,!?]*)", 
-                r"schedule for ([^.,!?]*)",
-                r"(\w+ \d+(?:st|nd|rd|th))",
-                r"(\d+/\d+/\d+)",
-                r"([A-Za-z]+ \d+)"
-            ],
-            "appointment_time": [
-                r"at (\d{1,2}:\d{2}\s*(?:am|pm))", 
-                r"time is (\d{1,2}:\d{2}\s*(?:am|pm))",
-                r"(\d{1,2}\s*(?:am|pm))",
-                r"(\d{1,2}:\d{2})"
-            ]
-        }
+        state = record["state"]
+        meta = record["meta"]
+        
+        # Only scan customer text we haven't scanned on an earlier fallback
+        customer_messages = self._transcript(record).contents("customer")
+        text = fallback_window(customer_messages, meta["fallback_scanned"])
+        meta["fallback_scanned"] = len(customer_messages)
         
-        for field, field_patterns in patterns.items():
+        for field, matcher in FALLBACK_MATCHERS.items():
             if not state["details_collected"][field]:
-                for pattern in field_patterns:
-                    match = re.search(pattern, full_text_lower)
-                    if match:
-                        extracted_value = match.group(1).strip()
+                for extracted_value in matcher.candidates(text):
+                    # Additional validation
+                    if field == "guardian_name" and extracted_value == state["details_collected"].get("pet_name"):
+                        continue
+                    if field == "pet_name" and extracted_value == state["details_collected"].get("guardian_name"):
+                        continue
                         
-                        # Additional validation
-                        if field == "guardian_name" and extracted_value == state["details_collected"].get("pet_name"):
-                            continue
-                        if field == "pet_name" and extracted_value == state["details_collected"].get("guardian_name"):
-                            continue
-                            
-                        state["details_collected"][field] = extracted_value.capitalize()
-                        break
+                    state["details_collected"][field] = extracted_value.capitalize()
+                    break
 
     def get_conversation_context(self, call_sid):
-        if call_sid not in self.conversations:
+        record = self.store.get(call_sid)
+        if record is None:
             return ""
         
-        # Get the full conversation history
-        return "\n".join([f"{msg['role']}: {msg['content']}" for msg in self.conversations[call_sid]])
+        # The full conversation history, rendered as the call went along
+        return self._transcript(record).context
+
+    def get_reply_context(self, call_sid):
+        """The conversation section of the reply prompt, bounded per REPLY_CONTEXT"""
+        record = self.store.get(call_sid)
+        if record is None:
+            return ""
+
+        with spans.span("reply_context", call_sid, record["state"]["stage"]) as attrs:
+            transcript = self._transcript(record)
+            if REPLY_CONTEXT == "full":
+                context = transcript.context
+                tokens = count_tokens(context)
+            else:
+                # The summary lives with the call so any worker can reuse it
+                summary = record["meta"].setdefault("context_summary", {})
+                context, tokens = self.context_builder.build(transcript, record["state"]["stage"], summary)
+                self.store.save(call_sid, record)
+            attrs["context_tokens"] = tokens
+        self.context_tokens.observe(tokens)
+        return context
+
+    def get_context_stats(self):
+        recorder = self.context_tokens
+        return {
+            "mode": REPLY_CONTEXT,
+            "max_tokens": self.context_builder.max_tokens,
+            "turns": recorder.count,
+            "p50_tokens": recorder.percentile(50),
+            "p95_tokens": recorder.percentile(95),
+            "max_tokens_seen": recorder.percentile(100)
+        }
     
     def get_conversation_state(self, call_sid):
-        return self.conversation_states.get(call_sid, {})
+        # A copy, so readers never see (or serialise) a turn half-way through updating it
+        record = self.store.peek(call_sid)
+        return copy.deepcopy(record["state"]) if record else {}
+
+    def get_transcript(self, call_sid):
+        record = self.store.peek(call_sid)
+        return self._transcript(record).to_list() if record else []
     
+    def get_last_message(self, call_sid, role):
+        record = self.store.peek(call_sid)
+        return self._transcript(record).last(role) if record else ""
+
     def should_conclude(self, call_sid):
-        state = self.get_conversation_state(call_sid)
-        if not state:
+        record = self.store.peek(call_sid)
+        if not record:
             return False
+        state = record["state"]
         
         # Check if all essential details are collected and confirmed
         details = state.get("details_collected", {})
@@ -226,11 +617,7 @@ class ConversationManager:
         ]
         
         # Check if the agent has said goodbye
-        last_agent_message = ""
-        if call_sid in self.conversations and self.conversations[call_sid]:
-            agent_messages = [msg["content"] for msg in self.conversations[call_sid] if msg["role"] == "agent"]
-            if agent_messages:
-                last_agent_message = agent_messages[-1].lower()
+        last_agent_message = self._transcript(record).last("agent").lower()
         
         goodbye_phrases = ["thank you", "goodbye", "have a great day", "look forward to seeing you"]
         said_goodbye = any(phrase in last_agent_message for phrase in goodbye_phrases)
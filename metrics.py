@@ -0,0 +1,134 @@
+import time
+import threading
+from contextlib import contextmanager
+from collections import deque, OrderedDict
+
+class LatencyRecorder:
+    """Keeps the most recent latency samples and reports percentiles over them"""
+    def __init__(self, max_samples=10000):
+        self.count = 0
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2)
+        }
+
+# Seconds; Prometheus' default latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# context_tokens is what the reply_context span built for the prompt; divide by
+# that span's count for prompt tokens per turn
+TOKEN_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens", "context_tokens")
+
+class Histogram:
+    """Cumulative bucket counts, sum and count, as Prometheus histograms keep them"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class SpanRecorder:
+    """Timing spans for each stage of a turn, tagged with CallSid and conversation stage.
+
+    Durations feed one histogram per (span, stage); the spans themselves are kept
+    per call, for the most recent `max_calls` calls, as a timeline.
+    """
+    def __init__(self, max_calls=1000, max_spans_per_call=500):
+        self.max_calls = max_calls
+        self.max_spans_per_call = max_spans_per_call
+        self._histograms = {}
+        self._tokens = {}
+        self._timelines = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, call_sid=None, stage=None):
+        """Time the block; anything put in the yielded dict (e.g. token counts) is kept with the span"""
+        attrs = {}
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - started, call_sid, stage, started_at, **attrs)
+
+    def record(self, name, seconds, call_sid=None, stage=None, started_at=None, **attrs):
+        with self._lock:
+            key = (name, stage or "")
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            for token_key in TOKEN_KEYS:
+                if token_key in attrs:
+                    self._tokens[(name, token_key)] = self._tokens.get((name, token_key), 0) + attrs[token_key]
+            if call_sid:
+                self._add_to_timeline(call_sid, {
+                    "span": name,
+                    "stage": stage,
+                    "started_at": started_at if started_at is not None else time.time() - seconds,
+                    "duration_ms": round(seconds * 1000, 2),
+                    **attrs
+                })
+
+    def timeline(self, call_sid):
+        with self._lock:
+            return list(self._timelines.get(call_sid, []))
+
+    def render_prometheus(self):
+        """The histograms and token counters in Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP vetagent_span_seconds Time spent in each stage of a webhook turn",
+                "# TYPE vetagent_span_seconds histogram"
+            ]
+            for (name, stage), histogram in sorted(self._histograms.items()):
+                labels = f'span="{name}",stage="{stage}"'
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'vetagent_span_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'vetagent_span_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"vetagent_span_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"vetagent_span_seconds_count{{{labels}}} {histogram.count}")
+            lines += [
+                "# HELP vetagent_llm_tokens_total Tokens used by LLM calls, or built into their prompts, by span",
+                "# TYPE vetagent_llm_tokens_total counter"
+            ]
+            for (name, token_key), count in sorted(self._tokens.items()):
+                lines.append(f'vetagent_llm_tokens_total{{span="{name}",type="{token_key}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def _add_to_timeline(self, call_sid, entry):
+        timeline = self._timelines.get(call_sid)
+        if timeline is None:
+            timeline = self._timelines[call_sid] = deque(maxlen=self.max_spans_per_call)
+            while len(self._timelines) > self.max_calls:
+                self._timelines.popitem(last=False)
+        self._timelines.move_to_end(call_sid)
+        timeline.append(entry)
+
+spans = SpanRecorder()
@@ -0,0 +1,780 @@
+"""Offline replay benchmark: drives scripted calls through the real webhook handlers.
+
+The LLMs and the Twilio client are replaced with fakes, so a run needs no
+network access and gives the same answers every time. Usage:
+
+    python replay.py --calls 200 --concurrency 20 --output bench.json
+    python replay.py --scripts recorded_calls.json
+    python replay.py --chatty 40 --ms-per-1k-prompt-tokens 30   # long, chatty callers
+    python replay.py --small-error-rate 0.2                      # exercise model escalation
+    python replay.py --duplicate-rate 0.3 --reply-latency 3000,6000  # Twilio retrying slow turns
+    python replay.py --streaming                                 # flush each reply's first sentence early
+    python replay.py --store sqlite                              # one worker's cached store instead of the shared one
+    python replay.py --check                                     # regression checks only
+    python replay.py --reply-latency 0,0 --extraction-latency 0,0 \
+        --small-reply-latency 0,0 --small-extraction-latency 0,0 # per-turn overhead outside the LLM
+
+The regression checks also run before every replay; a failing one aborts it.
+
+A script file is a JSON list of calls:
+    [{"phone_number": "+15550100", "details": {...optional seed...},
+      "turns": [{"speech": "My name is Ana Lopez", "extraction": {"guardian_name": "Ana Lopez"}}, ...],
+      "expected": {...optional, defaults to every turn's extraction merged...}}]
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import subprocess
+from types import SimpleNamespace
+
+# Configure the app for an offline run before any of its modules are imported.
+# Calls go through the store several uvicorn workers share, as in a scaled-out
+# deployment; --store picks another before the store is first built
+os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") or "replay"
+os.environ["CONVERSATION_STORE"] = "shared"
+os.environ["CONVERSATION_DB"] = os.path.join(tempfile.mkdtemp(prefix="replay-"), "conversations.db")
+os.environ["VOICE_STREAMING"] = "0"
+os.environ["AUDIO_SYNTH"] = ""
+os.environ["NGROK_BASE_URL"] = "http://replay"
+os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+os.environ["OTEL_SDK_DISABLED"] = "true"
+
+from crewai.llms.base_llm import BaseLLM
+
+ESSENTIAL_FIELDS = ["guardian_name", "pet_name", "pet_species", "appointment_date"]
+
+class LatencyModel:
+    """Log-normal latency fitted to a median and a 95th percentile, in milliseconds"""
+    def __init__(self, median_ms, p95_ms, rng):
+        self.mu = math.log(max(median_ms, 0.001))
+        self.sigma = max(math.log(max(p95_ms, median_ms, 0.001)) - self.mu, 0.0) / 1.645
+        self.rng = rng
+
+    def sample(self):
+        return self.rng.lognormvariate(self.mu, self.sigma) / 1000
+
+class FakeLLM(BaseLLM):
+    """Stands in for an OpenAI model: canned extraction JSON and scripted replies after a simulated delay.
+
+    With an `error_rate`, that share of extractions mistake the species for the
+    breed, which the extraction validator rejects, as a weaker model might.
+    """
+    def __init__(self, model, latency, extractions, seconds_per_prompt_token=0.0, error_rate=0.0, seed=0):
+        super().__init__(model=model, temperature=0)
+        self.latency = latency
+        self.extractions = extractions
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        # Prefill cost: longer prompts take longer before the first token
+        self.seconds_per_prompt_token = seconds_per_prompt_token
+        self.counters = {"calls": 0, "errors": 0}
+        self.prompt_tokens = []
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        raise NotImplementedError("the app sends prompts through completions.complete, not through crewai")
+
+    def _begin(self, messages):
+        prompt = "\n".join(m["content"] for m in messages)
+        prompt_tokens = len(prompt) // 4
+        with self._lock:
+            self.counters["calls"] += 1
+            self.prompt_tokens.append(prompt_tokens)
+            delay = self.latency.sample() + prompt_tokens * self.seconds_per_prompt_token
+        return prompt, prompt_tokens, delay
+
+    def _usage(self, prompt_tokens, answer):
+        completion_tokens = len(answer) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    async def complete(self, messages):
+        """An extraction or a reply, as completions.complete returns them"""
+        prompt, prompt_tokens, delay = self._begin(messages)
+        await asyncio.sleep(delay)
+        if "extracted_details" in prompt:
+            with self._lock:
+                mistaken = self._rng.random() < self.error_rate
+            answer = self._extraction(prompt, mistaken)
+        else:
+            answer = self._reply(prompt)
+        return answer, self._usage(prompt_tokens, answer)
+
+    async def stream(self, messages, on_first_sentence):
+        """A streamed reply: the first sentence arrives as far into the delay as it is into the text"""
+        from streaming import split_first_sentence
+        prompt, prompt_tokens, delay = self._begin(messages)
+        answer = self._reply(prompt)
+        first_sentence, _ = split_first_sentence(answer + " ")
+        share = len(first_sentence) / len(answer)
+        await asyncio.sleep(delay * share)
+        if first_sentence:
+            on_first_sentence(first_sentence)
+        await asyncio.sleep(delay * (1 - share))
+        return answer, self._usage(prompt_tokens, answer)
+
+    def _extraction(self, prompt, mistaken=False):
+        customer_lines = re.findall(r"^customer: (.*)$", prompt, re.MULTILINE)
+        canned = self.extractions.get(customer_lines[-1].strip(), {}) if customer_lines else {}
+        details = {field: value for field, value in canned.items() if field != "conversation_stage"}
+        if mistaken:
+            with self._lock:
+                self.counters["errors"] += 1
+            breed = details.get("pet_breed") or "Golden Retriever"
+            details.update(pet_species=breed, pet_breed=breed)
+        return json.dumps({"extracted_details": details, "conversation_stage": canned.get("conversation_stage", "")})
+
+    def _reply(self, prompt):
+        collected = prompt.split("DETAILS ALREADY COLLECTED:", 1)[-1].split("CONVERSATION HISTORY:", 1)[0]
+        known = {line.split(":", 1)[0].strip() for line in collected.splitlines() if ":" in line}
+        if all(field in known for field in ESSENTIAL_FIELDS):
+            return "Wonderful, your appointment is confirmed. Thank you and goodbye!"
+        return "Thanks! Could you tell me a little more so I can complete the booking?"
+
+class FakeCall:
+    def __init__(self, client, sid):
+        self.client = client
+        self.sid = sid
+
+    def update(self, status=None, **kwargs):
+        self.client.statuses[self.sid] = status
+        return SimpleNamespace(sid=self.sid, status=status)
+
+    def fetch(self):
+        self.client.fetches += 1
+        return SimpleNamespace(sid=self.sid, status=self.client.statuses.get(self.sid, "in-progress"))
+
+class FakeCalls:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, to, from_, url, **kwargs):
+        sid = f"CA{uuid.uuid4().hex}"
+        self.client.statuses[sid] = "queued"
+        return SimpleNamespace(sid=sid, status="queued")
+
+    def __call__(self, sid):
+        return FakeCall(self.client, sid)
+
+class FakeTwilioClient:
+    """The slice of twilio.rest.Client the app uses: calls.create, calls(sid).update and .fetch"""
+    def __init__(self):
+        self.statuses = {}
+        self.fetches = 0
+        self.calls = FakeCalls(self)
+
+GUARDIANS = ["Ana Lopez", "Ben Carter", "Chloe Nguyen", "David Okafor", "Emma Schmidt", "Farah Khan", "George Miller", "Hana Sato"]
+PETS = ["Biscuit", "Luna", "Milo", "Pepper", "Rocky", "Daisy", "Oliver", "Nala"]
+BREEDS = [("dog", "Golden Retriever"), ("dog", "Beagle"), ("dog", "German Shepherd"), ("cat", "Siamese"), ("cat", "Bengal"), ("cat", "Maine Coon")]
+DATES = ["March 5", "April 12", "May 20", "June 3", "July 18", "August 9"]
+TIMES = ["9:30 AM", "11:00 AM", "2:15 PM", "4:45 PM"]
+# Small talk that carries no details (and no confirmation words) for --chatty calls
+CHATTER = [
+    "Sorry, the line is a bit noisy here, I'm walking outside.",
+    "Honestly the last visit went really well, the staff were lovely.",
+    "Give me a second, I'm just looking for my calendar.",
+    "It has been a busy week with work and everything.",
+    "I always worry a little before these check ups.",
+    "Hold on, someone is at the door.",
+    "Okay, I'm back, sorry about that.",
+    "The weather has been so strange lately, hasn't it?"
+]
+
+def synthetic_scripts(count, seed, chatty=0):
+    """Calls where the customer gives their name, the pet, the breed and the slot, then confirms.
+
+    With `chatty`, that many turns of small talk come before the appointment slot.
+    """
+    rng = random.Random(seed)
+    scripts = []
+    for i in range(count):
+        guardian = rng.choice(GUARDIANS)
+        pet = rng.choice(PETS)
+        species, breed = rng.choice(BREEDS)
+        age = rng.randint(1, 14)
+        years = "year" if age == 1 else "years"
+        date = rng.choice(DATES)
+        slot = rng.choice(TIMES)
+        turns = [
+            {"speech": f"Hi, my name is {guardian}.",
+             "extraction": {"guardian_name": guardian, "conversation_stage": "collecting_pet_details"}},
+            {"speech": f"My {species}'s name is {pet} and {pet} is {age} {years} old.",
+             "extraction": {"pet_name": pet, "pet_species": species, "pet_dob": f"{age} {years} old", "conversation_stage": "collecting_pet_details"}},
+            {"speech": f"{pet} is a {breed}.",
+             "extraction": {"pet_breed": breed, "pet_species": species, "conversation_stage": "collecting_appointment"}},
+            *[{"speech": rng.choice(CHATTER), "extraction": {}} for _ in range(chatty)],
+            {"speech": f"The appointment is on {date} at {slot}.",
+             "extraction": {"appointment_date": date, "appointment_time": slot, "conversation_stage": "confirming"}},
+            {"speech": "Yes, that's correct.", "extraction": {"conversation_stage": "confirming"}},
+            {"speech": "No, that's everything. Thanks!", "extraction": {"conversation_stage": "concluded"}}
+        ]
+        scripts.append({"phone_number": f"+1555{i:07d}", "turns": turns})
+    return scripts
+
+DETAIL_FIELDS = ["guardian_name", "pet_name", "pet_dob", "pet_species", "pet_breed", "appointment_date", "appointment_time"]
+COLLECTED = {"guardian_name": "Ana Lopez", "pet_name": "Biscuit", "pet_dob": "7 years old", "pet_species": "dog",
+             "pet_breed": "Beagle", "appointment_date": "March 5", "appointment_time": "9:30 AM"}
+
+# (utterance, details already held, resolved by the fast tier?, fields it must set)
+EXTRACTION_REGRESSIONS = [
+    ("Yes, but can we move it to 10?", COLLECTED, False, {}),
+    ("Yes, that's correct.", COLLECTED, True, {}),
+    ("I'm afraid I don't know.", {}, False, {}),
+    ("I'm not sure, sorry.", {}, False, {}),
+    ("Hi, my name is Sarah Connor.", {}, True, {"guardian_name": "Sarah Connor"}),
+    ("Sarah Connor.", {}, True, {"guardian_name": "Sarah Connor"}),
+    ("This is Ana Lopez calling about Biscuit.", {}, False, {"guardian_name": "Ana Lopez"}),
+    ("My dog's name is Biscuit and Biscuit is 7 years old.", {"guardian_name": "Ana Lopez"}, True,
+     {"pet_name": "Biscuit", "pet_species": "dog", "pet_dob": "7 years old"}),
+    ("The appointment is on March 5 at 9:30 AM.", {**COLLECTED, "appointment_date": "", "appointment_time": ""}, True,
+     {"appointment_date": "March 5", "appointment_time": "9:30 AM"}),
+    ("Actually, make that March 7.", COLLECTED, False, {})
+]
+
+def check_extraction():
+    from extraction import FastExtractor
+    extractor = FastExtractor()
+    failures = []
+    for utterance, held, resolved, fields in EXTRACTION_REGRESSIONS:
+        details = {field: held.get(field, "") for field in DETAIL_FIELDS}
+        result = extractor.extract(utterance, details)
+        if result.resolved != resolved or any(result.fields.get(field) != value for field, value in fields.items()):
+            failures.append(f"{utterance!r}: resolved={result.resolved} fields={result.fields} ({result.reason})")
+    return failures
+
+GOOD = '{"extracted_details": {"guardian_name": "Ana Lopez", "pet_name": "Biscuit"}, "conversation_stage": "collecting_pet_details"}'
+
+# (raw extraction output, fields it must parse to, or None when it must be rejected)
+MALFORMED_OUTPUTS = [
+    (GOOD, {"guardian_name": "Ana Lopez", "conversation_stage": "collecting_pet_details"}),
+    (f"```json\n{GOOD}\n```", {"pet_name": "Biscuit"}),
+    (f"Here is the extraction:\n{GOOD}\nLet me know if you need anything else.", {"guardian_name": "Ana Lopez"}),
+    ('{"note": "scratch"} then ' + GOOD, {"pet_name": "Biscuit"}),
+    ('{"extracted_details": {"guardian_name": "Ana Lopez", "pet_name": "Biscuit",}, "conversation_stage": "greeting",}',
+     {"pet_name": "Biscuit", "conversation_stage": "greeting"}),
+    ("{'extracted_details': {'guardian_name': 'Ana Lopez', 'pet_name': None}, 'conversation_stage': 'greeting'}",
+     {"guardian_name": "Ana Lopez", "pet_name": ""}),
+    ('{"guardian_name": "Ana Lopez", "pet_dob": 7}', {"guardian_name": "Ana Lopez", "pet_dob": "7", "conversation_stage": ""}),
+    ('{"extracted_details": {"pet_name": "Mr {Whiskers}"}, "conversation_stage": null}', {"pet_name": "Mr {Whiskers}", "conversation_stage": ""}),
+    ('{"extracted_details": {"guardian_name": "Ana', None),
+    ("I couldn't find any details in this conversation.", None),
+    ("", None)
+]
+
+def check_extraction_parsing():
+    """Raw extraction outputs are repaired or rejected without another LLM call"""
+    from schemas import ExtractionResult, parse_json_object
+    failures = []
+    for raw, expected in MALFORMED_OUTPUTS:
+        try:
+            parsed = ExtractionResult.model_validate(parse_json_object(raw)).model_dump()
+        except ValueError:
+            if expected is not None:
+                failures.append(f"{raw!r}: rejected")
+            continue
+        if expected is None:
+            failures.append(f"{raw!r}: accepted as {parsed}")
+            continue
+        got = {**parsed["extracted_details"], "conversation_stage": parsed["conversation_stage"]}
+        wrong = {field: got.get(field) for field, value in expected.items() if got.get(field) != value}
+        if wrong:
+            failures.append(f"{raw!r}: got {wrong}")
+    return failures
+
+def check_webhook_dedup():
+    """Deliveries sharing an I-Twilio-Idempotency-Token run the turn (and its kickoff) once"""
+    from idempotency import WebhookDeduplicator, delivery_key
+    deduplicator = WebhookDeduplicator()
+    kickoffs = []
+
+    async def kickoff():
+        kickoffs.append(1)
+        await asyncio.sleep(0.01)
+        return f"reply {len(kickoffs)}"
+
+    async def deliver(token):
+        headers = {"i-twilio-idempotency-token": token}
+        return await deduplicator.run(delivery_key("CA-dedup", headers, None), kickoff)
+
+    async def run():
+        # A retry while the first delivery is running, then one after it finished
+        first, retry = await asyncio.gather(deliver("token-1"), deliver("token-1"))
+        late = await deliver("token-1")
+        other = await deliver("token-2")
+        return first, retry, late, other
+
+    first, retry, late, other = asyncio.run(run())
+    failures = []
+    if len(kickoffs) != 2:
+        failures.append(f"2 distinct deliveries made {len(kickoffs)} kickoffs")
+    if not first == retry == late:
+        failures.append(f"retries got different replies: {first!r}, {retry!r}, {late!r}")
+    if other == first:
+        failures.append("a new delivery got the previous delivery's reply")
+    return failures
+
+def check_call_locks(calls=20, overlapping=10):
+    """Overlapping webhooks for one call apply in arrival order; different calls run in parallel"""
+    from manager import ConversationManager
+    from workers import store_pool
+    manager = ConversationManager()
+    hold = 0.01
+
+    async def webhook(call_sid, n):
+        async with manager.lock_call(call_sid):
+            # Read, wait on the "LLM", then write, as a turn does
+            before = len(await store_pool.run(manager.get_transcript, call_sid))
+            await asyncio.sleep(hold)
+            await store_pool.run(manager.update_conversation, call_sid, "customer", f"turn {n} after {before}")
+
+    async def run():
+        sids = [f"CA-stress-{uuid.uuid4().hex}" for _ in range(calls)]
+        for call_sid in sids:
+            manager.initialize_conversation(call_sid)
+        started = time.perf_counter()
+        # Every call's webhooks are all in flight at once, interleaved across calls
+        await asyncio.gather(*[webhook(call_sid, n) for n in range(overlapping) for call_sid in sids])
+        return sids, time.perf_counter() - started
+
+    sids, elapsed = asyncio.run(run())
+    failures = []
+    expected = [f"turn {n} after {n}" for n in range(overlapping)]
+    for call_sid in sids:
+        got = [message["content"] for message in manager.get_transcript(call_sid)]
+        if got != expected:
+            failures.append(f"{call_sid}: {got}")
+            break
+    # Serialised per call, so about `overlapping` holds; all calls in series would be `calls` times that
+    if elapsed > calls * overlapping * hold / 2:
+        failures.append(f"{calls} calls took {elapsed:.2f}s, as if they waited on each other")
+    return failures
+
+def check_campaigns(numbers=30, per_second=1000.0, max_concurrent=4):
+    """The dialer keeps to its rate and concurrency limits, retries what it should and forgets old campaigns"""
+    from campaigns import CampaignDispatcher, RETRY_STATUSES
+    rng = random.Random(3)
+    starts = []
+    live = {"now": 0, "peak": 0}
+    dispatcher = None
+
+    async def place_call(phone_number, details):
+        starts.append(time.monotonic())
+        await asyncio.sleep(rng.uniform(0.001, 0.005))
+        if rng.random() < 0.2:
+            raise RuntimeError("Twilio is unavailable")
+        call_sid = f"CA{uuid.uuid4().hex}"
+        live["now"] += 1
+        live["peak"] = max(live["peak"], live["now"])
+        asyncio.get_running_loop().call_later(rng.uniform(0.005, 0.02), hang_up, call_sid)
+        return call_sid
+
+    def hang_up(call_sid):
+        live["now"] -= 1
+        dispatcher.on_status(call_sid, rng.choice(["completed", "completed", "no-answer", "busy"]))
+
+    async def get_status(call_sid):
+        return "in-progress"
+
+    async def run():
+        nonlocal dispatcher
+        dispatcher = CampaignDispatcher(place_call, get_status, calls_per_second=per_second, max_concurrent=max_concurrent,
+                                        max_attempts=3, backoff_seconds=0.005, status_poll_seconds=0.05, max_campaigns=2)
+        campaign = dispatcher.create([{"phone_number": f"+1555{i:07d}"} for i in range(numbers)])
+        while dispatcher.progress(campaign["id"])["done"] < numbers:
+            await asyncio.sleep(0.01)
+        progress = dispatcher.progress(campaign["id"])
+        # Two more finished campaigns push the first one out
+        for _ in range(2):
+            dispatcher.create([])
+        return progress, campaign["id"] in dispatcher.campaigns
+
+    progress, kept = asyncio.run(run())
+    failures = []
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    if gaps and min(gaps) < 0.9 / per_second:
+        failures.append(f"dials {min(gaps) * 1000:.2f}ms apart at {per_second}/s")
+    if live["peak"] > max_concurrent:
+        failures.append(f"{live['peak']} calls live at once with a cap of {max_concurrent}")
+    for call in progress["calls"]:
+        if call["status"] in RETRY_STATUSES and call["attempts"] != 3:
+            failures.append(f"{call['phone_number']} ended {call['status']} after {call['attempts']} attempts")
+        if call["status"] == "completed" and not 1 <= call["attempts"] <= 3:
+            failures.append(f"{call['phone_number']} completed after {call['attempts']} attempts")
+    if len(starts) <= numbers:
+        failures.append("nothing was retried")
+    if kept:
+        failures.append("a finished campaign was kept past max_campaigns")
+    return failures
+
+def check_call_status_cache(callers=20, delay=0.02):
+    """Concurrent misses for one call share one Twilio fetch, and a failed fetch isn't kept"""
+    from call_status import CallStatusCache
+    from workers import twilio_pool
+    twilio_client = FakeTwilioClient()
+    twilio_up = {"now": False}
+    attempts = []
+
+    def fetch_from_twilio(call_sid):
+        attempts.append(call_sid)
+        # A REST round trip, long enough for every caller to miss while it's in flight
+        time.sleep(delay)
+        if not twilio_up["now"]:
+            raise RuntimeError("Twilio is unavailable")
+        return twilio_client.calls(call_sid).fetch()
+
+    async def fetch(call_sid):
+        return (await twilio_pool.run(fetch_from_twilio, call_sid)).status
+
+    async def run():
+        cache = CallStatusCache(fetch)
+        lookups = lambda: asyncio.gather(*[cache.get("CA-status") for _ in range(callers)], return_exceptions=True)
+        down = await lookups()
+        left_inflight = dict(cache._inflight)
+        twilio_up["now"] = True
+        up = await lookups()
+        cached = await lookups()
+        return down, left_inflight, up, cached, cache.stats
+
+    down, left_inflight, up, cached, stats = asyncio.run(run())
+    failures = []
+    if not all(isinstance(result, RuntimeError) for result in down):
+        failures.append(f"callers during a failed fetch got {set(map(repr, down))}")
+    if left_inflight:
+        failures.append("the failed fetch was left in flight for later callers")
+    if up != ["in-progress"] * callers:
+        failures.append(f"callers after Twilio recovered got {set(map(repr, up))}")
+    if cached != ["in-progress"] * callers:
+        failures.append(f"cached lookups got {set(map(repr, cached))}")
+    if len(attempts) != 2 or twilio_client.fetches != 1:
+        failures.append(f"{3 * callers} lookups in three rounds made {len(attempts)} Twilio fetches, expected 2 (one failed)")
+    if stats["hits"] != callers:
+        failures.append(f"{stats['hits']} cache hits after a successful fetch, expected {callers}")
+    return failures
+
+# One worker process of the shared store: takes `turns` turns on a call, each a
+# read-modify-write under the call lock with a pause in the middle
+LEASE_WORKER = """
+import sys, asyncio
+from store import SharedConversationStore, SQLiteBackend
+from locks import CallLock, CallLocks
+
+path, call_sid, turns = sys.argv[1], sys.argv[2], int(sys.argv[3])
+store = SharedConversationStore(SQLiteBackend(path))
+locks = CallLocks()
+
+async def main():
+    for _ in range(turns):
+        async with CallLock(store, call_sid, locks):
+            record = store.get(call_sid)
+            await asyncio.sleep(0.002)
+            record["turns"] += 1
+            store.save(call_sid, record)
+
+asyncio.run(main())
+"""
+
+def check_leases(workers=2, turns=20):
+    """Workers sharing one call-state file never lose each other's updates to a call"""
+    from store import SharedConversationStore, SQLiteBackend
+    path = os.path.join(tempfile.mkdtemp(prefix="leases-"), "conversations.db")
+    store = SharedConversationStore(SQLiteBackend(path))
+    store.put("CA-lease", {"turns": 0})
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    processes = [
+        subprocess.Popen([sys.executable, "-c", LEASE_WORKER, path, "CA-lease", str(turns)], cwd=here, stderr=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    failures = [f"worker exited with {process.returncode}: {stderr.strip()}" for process in processes
+                for _, stderr in [process.communicate()] if process.returncode]
+    got = store.get("CA-lease")["turns"]
+    if got != workers * turns:
+        failures.append(f"{workers} workers took {workers * turns} turns but the record shows {got}")
+    return failures
+
+def run_checks():
+    """Deterministic regression checks; raises with every failure found"""
+    failures = []
+    for check in CHECKS:
+        failures += [f"{check.__name__}: {failure}" for failure in check()]
+    if failures:
+        raise AssertionError("regression checks failed:\n" + "\n".join(failures))
+
+CHECKS = [
+    check_extraction, check_extraction_parsing, check_webhook_dedup, check_call_locks, check_campaigns,
+    check_call_status_cache, check_leases
+]
+
+def expected_details(script):
+    if "expected" in script:
+        return script["expected"]
+    expected = {}
+    for turn in script["turns"]:
+        expected.update({k: v for k, v in turn.get("extraction", {}).items() if k != "conversation_stage"})
+    return expected
+
+def canned_extractions(scripts):
+    return {turn["speech"].strip(): turn.get("extraction", {}) for script in scripts for turn in script["turns"]}
+
+async def replay_call(http, script, turn_latency, by_position, duplicate_rate, rng):
+    """Play one script through /start-call and /voice-webhook; returns the outcome.
+
+    A `duplicate_rate` share of turns are delivered twice, the second copy while
+    the first is still running, as Twilio does when a webhook times out. Turn
+    latency is the time to the webhook's answer, which is when the caller starts
+    hearing the reply; with streaming, the rest is then fetched from /voice-continue.
+    """
+    response = await http.post("/start-call", json={"phone_number": script["phone_number"], "details": script.get("details")})
+    call_sid = response.json()["sid"]
+
+    speeches = [None] + [turn["speech"] for turn in script["turns"]]
+    turns = 0
+    concluded = False
+    for speech in speeches:
+        form = {"CallSid": call_sid}
+        if speech:
+            form["SpeechResult"] = speech
+        headers = {"I-Twilio-Idempotency-Token": uuid.uuid4().hex}
+        started = time.perf_counter()
+        if rng.random() < duplicate_rate:
+            async def retry():
+                await asyncio.sleep(0.01)
+                return await http.post("/voice-webhook", data=form, headers=headers)
+            response, duplicate = await asyncio.gather(http.post("/voice-webhook", data=form, headers=headers), retry())
+            if duplicate.text != response.text:
+                raise RuntimeError(f"retried delivery got a different answer for {call_sid}")
+        else:
+            response = await http.post("/voice-webhook", data=form, headers=headers)
+        turn_latency.observe(time.perf_counter() - started)
+        by_position.setdefault(turns, []).append(time.perf_counter() - started)
+        turns += 1
+        if response.status_code != 200:
+            raise RuntimeError(f"/voice-webhook returned {response.status_code}: {response.text}")
+        if "<Redirect" in response.text:
+            response = await http.post("/voice-continue", data={"CallSid": call_sid})
+        if "<Hangup" in response.text:
+            concluded = True
+            break
+
+    state = (await http.get(f"/conversation-state/{call_sid}")).json()
+    return {"turns": turns, "concluded": concluded, "details": state.get("details_collected", {}), "expected": expected_details(script)}
+
+async def replay(app, scripts, concurrency, duplicate_rate=0.0, seed=0):
+    import httpx
+    from metrics import LatencyRecorder
+
+    turn_latency = LatencyRecorder(max_samples=1000000)
+    by_position = {}
+    rng = random.Random(seed)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded(http, script):
+        async with slots:
+            return await replay_call(http, script, turn_latency, by_position, duplicate_rate, rng)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as http:
+        # Build the agents, store and clients first, as a deployment's readiness probe does
+        await http.get("/ready", params={"warm": 1})
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*[bounded(http, script) for script in scripts])
+        elapsed = time.perf_counter() - started
+    return outcomes, turn_latency, by_position, elapsed
+
+def accuracy(outcomes):
+    fields = {}
+    fully_correct = 0
+    for outcome in outcomes:
+        all_match = True
+        for field, expected in outcome["expected"].items():
+            got = str(outcome["details"].get(field) or "").strip().lower()
+            match = got == str(expected).strip().lower()
+            counters = fields.setdefault(field, [0, 0])
+            counters[0] += int(match)
+            counters[1] += 1
+            all_match = all_match and match
+        fully_correct += int(all_match)
+    total = sum(counters[1] for counters in fields.values())
+    return {
+        "fields": round(sum(counters[0] for counters in fields.values()) / total, 4) if total else None,
+        "calls_fully_correct": round(fully_correct / len(outcomes), 4) if outcomes else None,
+        "per_field": {field: round(hit / n, 4) for field, (hit, n) in sorted(fields.items())}
+    }
+
+def by_turn_position(by_position):
+    """Median turn latency at each turn number, in ms; flat means long calls cost no more per turn"""
+    return {str(position): round(sorted(samples)[len(samples) // 2] * 1000, 2) for position, samples in sorted(by_position.items())}
+
+def prompt_tokens(llm):
+    samples = sorted(llm.prompt_tokens)
+    if not samples:
+        return None
+    return {"mean": round(sum(samples) / len(samples), 1), "p95": samples[int(0.95 * (len(samples) - 1))], "max": samples[-1]}
+
+def install_fakes(scripts, args):
+    """Import the app with fake LLMs answering for the scripts and a fake Twilio client; returns (api, fakes).
+
+    `args` carries the latency, error-rate and seed options of the command line.
+    """
+    rng = random.Random(args.seed)
+    extractions = canned_extractions(scripts)
+    per_token = args.ms_per_1k_prompt_tokens / 1000 / 1000
+
+    # One pair of stubs per routed model, swapped in for the agents' LLMs so
+    # each prompt is sent with the stub's model name
+    import agents
+    from routing import model_router
+    fakes = {}
+    for model in model_router.models:
+        small = model == model_router.small_model
+        reply_latency = args.small_reply_latency if small else args.reply_latency
+        extraction_latency = args.small_extraction_latency if small else args.extraction_latency
+        fakes[model] = {
+            "reply": FakeLLM(f"fake-reply-{model}", LatencyModel(*map(float, reply_latency.split(",")), rng), extractions, per_token),
+            "extraction": FakeLLM(
+                f"fake-extraction-{model}", LatencyModel(*map(float, extraction_latency.split(",")), rng), extractions, per_token,
+                error_rate=args.small_error_rate if small else 0.0, seed=args.seed
+            )
+        }
+        for agent, llm in [(agents.get_vet_appointment_agent(model), fakes[model]["reply"]), (agents.get_data_extraction_agent(model), fakes[model]["extraction"])]:
+            agent.llm = llm
+            agent.verbose = False
+
+    import api
+    # Turns call OpenAI's async client directly, with the model name of the agent's LLM
+    stubs = {llm.model: llm for llms in fakes.values() for llm in llms.values()}
+    api.complete = lambda messages, model, temperature, response_format=None: stubs[model].complete(messages)
+    api.stream_reply = lambda messages, model, temperature, on_first_sentence: stubs[model].stream(messages, on_first_sentence)
+    twilio_client = FakeTwilioClient()
+    api.get_twilio_client = lambda: twilio_client
+    return api, fakes
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scripts", help="JSON file of call scripts; synthetic calls are generated if omitted")
+    parser.add_argument("--calls", type=int, default=50, help="number of synthetic calls")
+    parser.add_argument("--concurrency", type=int, default=10, help="calls in flight at once")
+    parser.add_argument("--reply-latency", default="50,150", help="fake reply LLM latency as median,p95 in ms")
+    parser.add_argument("--extraction-latency", default="40,120", help="fake extraction LLM latency as median,p95 in ms")
+    parser.add_argument("--chatty", type=int, default=0, help="turns of small talk added to each synthetic call")
+    parser.add_argument("--ms-per-1k-prompt-tokens", type=float, default=0.0, help="extra fake LLM latency per 1000 prompt tokens")
+    parser.add_argument("--small-reply-latency", default="25,80", help="fake reply latency of the small model, median,p95 in ms")
+    parser.add_argument("--small-extraction-latency", default="20,60", help="fake extraction latency of the small model, median,p95 in ms")
+    parser.add_argument("--small-error-rate", type=float, default=0.1, help="share of the small model's extractions that fail validation")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="share of webhook deliveries Twilio retries mid-turn")
+    parser.add_argument("--streaming", action="store_true", help="stream replies and flush the first sentence early (VOICE_STREAMING=1)")
+    parser.add_argument("--store", choices=["shared", "sqlite", "memory"], default="shared", help="CONVERSATION_STORE for the replayed calls")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--check", action="store_true", help="run the regression checks and exit")
+    parser.add_argument("--output", help="write the JSON report here instead of to stderr")
+    args = parser.parse_args()
+
+    os.environ["CONVERSATION_STORE"] = args.store
+    run_checks()
+    if args.check:
+        print("regression checks passed", file=sys.stderr)
+        return 0
+
+    if args.scripts:
+        with open(args.scripts) as f:
+            scripts = json.load(f)
+    else:
+        scripts = synthetic_scripts(args.calls, args.seed, args.chatty)
+
+    os.environ["VOICE_STREAMING"] = "1" if args.streaming else "0"
+    api, fakes = install_fakes(scripts, args)
+    from routing import model_router
+
+    outcomes, turn_latency, by_position, elapsed = asyncio.run(replay(api.app, scripts, args.concurrency, args.duplicate_rate, args.seed))
+    llm_calls = {model: {role: llm.counters["calls"] for role, llm in llms.items()} for model, llms in fakes.items()}
+    llm_prompt_tokens = {model: {role: prompt_tokens(llm) for role, llm in llms.items()} for model, llms in fakes.items()}
+    injected_errors = {model: llms["extraction"].counters["errors"] for model, llms in fakes.items()}
+    routing = model_router.stats()
+    webhook_dedup = dict(api.webhook_deduplicator.stats)
+    first_audio = {mode: recorder.summary() for mode, recorder in api.voice_latency.items() if recorder.count}
+    speculation = api.speculator.summary() if api.speculator else None
+
+    # A second, smaller pass under tracemalloc so tracing doesn't skew the timings
+    memory_scripts = scripts[:args.concurrency]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    asyncio.run(replay(api.app, memory_scripts, args.concurrency))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    turns = sum(outcome["turns"] for outcome in outcomes)
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "calls": len(scripts),
+            "concurrency": args.concurrency,
+            "reply_latency_ms": args.reply_latency,
+            "extraction_latency_ms": args.extraction_latency,
+            "model_routing": model_router.enabled,
+            "small_reply_latency_ms": args.small_reply_latency,
+            "small_extraction_latency_ms": args.small_extraction_latency,
+            "small_error_rate": args.small_error_rate,
+            "chatty": args.chatty,
+            "duplicate_rate": args.duplicate_rate,
+            "streaming": args.streaming,
+            "store": args.store,
+            "speculation": os.getenv("SPECULATION", "0") == "1",
+            "ms_per_1k_prompt_tokens": args.ms_per_1k_prompt_tokens,
+            "reply_context": os.getenv("REPLY_CONTEXT", "window"),
+            "seed": args.seed
+        },
+        "turns": turns,
+        "elapsed_seconds": round(elapsed, 3),
+        "turns_per_second": round(turns / elapsed, 2) if elapsed else None,
+        "turn_latency_ms": {
+            "p50": round(turn_latency.percentile(50) * 1000, 2),
+            "p95": round(turn_latency.percentile(95) * 1000, 2),
+            "p99": round(turn_latency.percentile(99) * 1000, 2)
+        },
+        "turn_latency_p50_ms_by_turn": by_turn_position(by_position),
+        # Compare a run with --streaming against one without
+        "time_to_first_audio_ms": first_audio,
+        "concluded_fraction": round(sum(outcome["concluded"] for outcome in outcomes) / len(outcomes), 4) if outcomes else None,
+        "peak_bytes_per_call": int((peak - baseline) / max(len(memory_scripts), 1)),
+        "llm_calls": llm_calls,
+        "llm_prompt_tokens": llm_prompt_tokens,
+        "injected_extraction_errors": injected_errors,
+        "routing": routing,
+        # With retries, LLM calls should match a run without them
+        "webhook_dedup": webhook_dedup,
+        "speculation": speculation,
+        "extraction_accuracy": accuracy(outcomes)
+    }
+
+    # Every turn was handled once however many times Twilio delivered it
+    handled = webhook_dedup["deliveries"] - webhook_dedup["joined_inflight"] - webhook_dedup["replayed"]
+    if handled != turns:
+        print(f"warning: {turns} turns were handled {handled} times", file=sys.stderr)
+    if report["concluded_fraction"] is not None and report["concluded_fraction"] < 1:
+        print(f"warning: only {report['concluded_fraction']:.0%} of calls concluded", file=sys.stderr)
+
+    # Not stdout: the app prints its own logging there
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file=sys.stderr)
+
+if __name__ == "__main__":
+    sys.exit(main())
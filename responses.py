@@ -0,0 +1,117 @@
+import re
+import time
+import random
+import threading
+from collections import OrderedDict
+
+# (turn, stage or None for any stage, fields that must be known, variants).
+# Variants are str.format templates over the collected details plus {last_question}.
+TEMPLATES = [
+    ("opening", "greeting", [], [
+        "Hello! I'm calling from the veterinary clinic to confirm your pet's upcoming appointment. May I have your name, please?",
+        "Hi there! This is your veterinary clinic calling about an upcoming appointment for your pet. Could I start with your name?"
+    ]),
+    ("opening", "confirming", ["guardian_name", "pet_name", "appointment_date", "appointment_time"], [
+        "Hi {guardian_name}! I'm calling from the veterinary clinic to confirm {pet_name}'s appointment on {appointment_date} at {appointment_time}. Is that still right for you?",
+        "Hello {guardian_name}, this is the veterinary clinic. We have {pet_name} booked in for {appointment_date} at {appointment_time}. Can you confirm that works?"
+    ]),
+    ("reprompt", None, [], [
+        "Sorry, I didn't catch that. {last_question}",
+        "I'm sorry, I couldn't hear you there. {last_question}"
+    ]),
+    ("closing", None, [], [
+        "Thank you for confirming all the details! We look forward to seeing you and your pet. Have a wonderful day!"
+    ]),
+    ("closing", None, ["guardian_name", "pet_name"], [
+        "Thank you for confirming all the details, {guardian_name}! We look forward to seeing {pet_name}. Have a wonderful day!",
+        "Thanks so much, {guardian_name}! Everything's confirmed and we look forward to seeing {pet_name}. Have a wonderful day!"
+    ])
+]
+
+def fixed_lines():
+    """Template variants that never change from call to call"""
+    return [variant for _, _, _, variants in TEMPLATES for variant in variants if "{" not in variant]
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+def last_sentence(text):
+    """The question a re-prompt repeats: the agent's replies end with what they're asking"""
+    return SENTENCE_BREAK.split(text.strip())[-1] if text else ""
+
+class ResponseCache:
+    """Ready-made agent lines for predictable turns, keyed on stage and which details are known.
+
+    Entries start from TEMPLATES and can also learn LLM replies for turns that
+    don't depend on any collected values. Entries expire after `ttl_seconds` and
+    the least recently used are dropped beyond `max_size`.
+    """
+    def __init__(self, max_size=1024, ttl_seconds=3600, max_variants=4):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_variants = max_variants
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def fingerprint(self, turn, stage, details):
+        known = tuple(sorted(field for field, value in details.items() if value and field != "appointment_confirmed"))
+        return turn, stage, known
+
+    def lookup(self, turn, stage, details, last_question=""):
+        """A rendered line for this turn, or None if it has to go to the LLM"""
+        key = self.fingerprint(turn, stage, details)
+        with self._lock:
+            variants = self._variants(key)
+            counters = self.stats.setdefault(turn, {"hits": 0, "misses": 0})
+            counters["hits" if variants else "misses"] += 1
+        if not variants:
+            return None
+        values = {field: value for field, value in details.items() if value}
+        return random.choice(variants).format(last_question=last_question, **values).strip()
+
+    def learn(self, turn, stage, details, text):
+        """Keep an LLM reply as another variant, if the turn didn't depend on any details"""
+        key = self.fingerprint(turn, stage, details)
+        if key[2]:
+            return
+        variant = text.replace("{", "{{").replace("}", "}}")
+        with self._lock:
+            variants = self._variants(key)
+            if variant not in variants and len(variants) < self.max_variants:
+                self._store(key, variants + [variant])
+
+    def hit_rate(self):
+        with self._lock:
+            hits = sum(counters["hits"] for counters in self.stats.values())
+            total = hits + sum(counters["misses"] for counters in self.stats.values())
+            return {"hit_rate": hits / total if total else None, "turns": dict(self.stats)}
+
+    def _variants(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            return entry[0]
+        variants = _template_variants(*key)
+        if variants:
+            self._store(key, variants)
+        else:
+            self._entries.pop(key, None)
+        return variants
+
+    def _store(self, key, variants):
+        self._entries[key] = (variants, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+def _template_variants(turn, stage, known):
+    # Prefer the template that uses the most of what we know
+    best = None
+    for template_turn, template_stage, required, variants in TEMPLATES:
+        if template_turn != turn or template_stage not in (None, stage):
+            continue
+        if not set(required) <= set(known):
+            continue
+        if best is None or len(required) > len(best[0]):
+            best = (required, variants)
+    return list(best[1]) if best else []
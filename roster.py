@@ -0,0 +1,57 @@
+import os
+import csv
+import sqlite3
+import threading
+
+ROSTER_FIELDS = [
+    "guardian_name",
+    "pet_name",
+    "pet_species",
+    "pet_breed",
+    "pet_dob",
+    "appointment_date",
+    "appointment_time"
+]
+
+class CSVRoster:
+    """Appointments from a CSV file with an appointment_id column, reloaded when the file changes"""
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def get(self, appointment_id):
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            if mtime != self._mtime:
+                with open(self.path, newline="") as f:
+                    self._rows = {row["appointment_id"]: row for row in csv.DictReader(f)}
+                self._mtime = mtime
+            row = self._rows.get(str(appointment_id))
+        return _details(row) if row else None
+
+class SQLiteRoster:
+    """Appointments from the `appointments` table of a SQLite file, keyed by appointment_id"""
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+    def get(self, appointment_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM appointments WHERE appointment_id = ?", (str(appointment_id),)
+            ).fetchone()
+        return _details(dict(row)) if row else None
+
+def _details(row):
+    return {field: str(row.get(field) or "").strip() for field in ROSTER_FIELDS}
+
+def open_roster(path):
+    """The roster at `path` (.csv, otherwise SQLite), or None when no roster is configured"""
+    if not path:
+        return None
+    if path.lower().endswith(".csv"):
+        return CSVRoster(path)
+    return SQLiteRoster(path)
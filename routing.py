@@ -0,0 +1,92 @@
+import os
+import threading
+from extraction import awaited_fields
+from metrics import LatencyRecorder
+
+SMALL_MODEL = os.getenv("SMALL_MODEL", "gpt-4o-mini")
+LARGE_MODEL = os.getenv("LARGE_MODEL", "gpt-4o")
+
+# "0" sends everything to LARGE_MODEL, as before routing existed
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") == "1"
+
+COLLECTING_STAGES = ("collecting_guardian", "collecting_pet_details", "collecting_appointment")
+
+class ModelRouter:
+    """Picks the model for each LLM call and keeps per-model stats.
+
+    Extraction and routine replies (the greeting, or asking for the one field
+    still missing) go to the small model. Confirmation goes to the large one, and
+    an extraction whose output fails to parse or validate is retried on it.
+    """
+    def __init__(self, small_model, large_model, enabled=True):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (role, model) -> {"calls", "failures", "latency"}
+        self._models = {}
+        self._escalations = {}
+
+    @property
+    def models(self):
+        return [self.small_model, self.large_model] if self.enabled else [self.large_model]
+
+    def reply_model(self, stage, details):
+        if not self.enabled:
+            return self.large_model
+        if stage == "greeting" or (stage in COLLECTING_STAGES and len(awaited_fields(details)) <= 1):
+            return self.small_model
+        return self.large_model
+
+    def extraction_model(self, stage):
+        if not self.enabled or stage == "confirming":
+            return self.large_model
+        return self.small_model
+
+    def escalate(self, role, model, reason):
+        """The model to retry with after `model` failed, or None when it was already the large one"""
+        if model == self.large_model:
+            return None
+        with self._lock:
+            key = (role, reason)
+            self._escalations[key] = self._escalations.get(key, 0) + 1
+        print(f"Escalating {role} from {model} to {self.large_model}: {reason}")
+        return self.large_model
+
+    def observe(self, role, model, seconds, ok=True):
+        with self._lock:
+            counters = self._models.get((role, model))
+            if counters is None:
+                counters = self._models[(role, model)] = {"calls": 0, "failures": 0, "latency": LatencyRecorder()}
+            counters["calls"] += 1
+            counters["failures"] += int(not ok)
+        counters["latency"].observe(seconds)
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for (role, model), counters in sorted(self._models.items()):
+                calls = counters["calls"]
+                models.setdefault(role, {})[model] = {
+                    # Outputs that parsed and validated; the closest thing to accuracy we see live
+                    "valid_rate": round(1 - counters["failures"] / calls, 3) if calls else None,
+                    **counters["latency"].summary()
+                }
+            escalations = {}
+            for (role, reason), count in sorted(self._escalations.items()):
+                escalations.setdefault(role, {})[reason] = count
+
+        rates = {}
+        for role, by_reason in escalations.items():
+            small_calls = models.get(role, {}).get(self.small_model, {}).get("count", 0)
+            rates[role] = round(sum(by_reason.values()) / small_calls, 3) if small_calls else None
+        return {
+            "enabled": self.enabled,
+            "small_model": self.small_model,
+            "large_model": self.large_model,
+            "models": models,
+            "escalations": escalations,
+            "escalation_rate": rates
+        }
+
+model_router = ModelRouter(SMALL_MODEL, LARGE_MODEL, enabled=MODEL_ROUTING)
@@ -0,0 +1,101 @@
+import re
+import ast
+import json
+from pydantic import BaseModel, Field, field_validator
+
+DETAIL_FIELDS = [
+    "guardian_name",
+    "pet_name",
+    "pet_species",
+    "pet_breed",
+    "pet_dob",
+    "appointment_date",
+    "appointment_time"
+]
+
+class ExtractedDetails(BaseModel):
+    guardian_name: str = ""
+    pet_name: str = ""
+    pet_species: str = ""
+    pet_breed: str = ""
+    pet_dob: str = ""
+    appointment_date: str = ""
+    appointment_time: str = ""
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _as_text(cls, value):
+        # Models write null for unknown fields and sometimes bare numbers for ages
+        return "" if value is None else str(value)
+
+class ExtractionResult(BaseModel):
+    """The JSON shape the extraction tasks return"""
+    extracted_details: ExtractedDetails = Field(default_factory=ExtractedDetails)
+    conversation_stage: str = ""
+
+    @field_validator("conversation_stage", mode="before")
+    @classmethod
+    def _stage_as_text(cls, value):
+        return "" if value is None else str(value)
+
+def _strict_object(properties):
+    # Strict structured outputs need every property listed as required and no others allowed
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+# Sent with every extraction request, so the API only lets the model produce an
+# ExtractionResult-shaped object; a field that wasn't mentioned is an empty string
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "extraction_result",
+        "strict": True,
+        "schema": _strict_object({
+            "extracted_details": _strict_object({field: {"type": "string"} for field in DETAIL_FIELDS}),
+            "conversation_stage": {"type": "string"}
+        })
+    }
+}
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def parse_json_object(raw):
+    """Pull the extraction object out of raw model output.
+
+    Tries every "{" in turn with a streaming decoder, so prose, code fences or a
+    second object around the JSON don't matter. Objects that only hold the
+    details (the wrapper got cut off) are wrapped back up; trailing commas and
+    Python-style dicts are repaired as a last resort.
+    """
+    text = raw.strip()
+    decoder = json.JSONDecoder()
+    details_only = None
+    start = text.find("{")
+    while start != -1:
+        data = _decode_at(decoder, text, start)
+        if isinstance(data, dict):
+            if "extracted_details" in data or "conversation_stage" in data:
+                return data
+            if details_only is None and any(field in data for field in DETAIL_FIELDS):
+                details_only = {"extracted_details": data}
+        start = text.find("{", start + 1)
+    if details_only is not None:
+        return details_only
+    raise ValueError("No JSON found in response")
+
+def _decode_at(decoder, text, start):
+    try:
+        return decoder.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        pass
+    end = text.rfind("}")
+    if end <= start:
+        return None
+    candidate = TRAILING_COMMA.sub(r"\1", text[start:end + 1])
+    try:
+        return decoder.raw_decode(candidate)[0]
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(candidate)
+    except (ValueError, SyntaxError):
+        return None
@@ -0,0 +1,180 @@
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from extraction import awaited_fields
+
+PLACEHOLDER_RE = re.compile(r"\[\[(\w+)\]\]")
+
+def placeholder(field):
+    return f"[[{field}]]"
+
+def predict_answers(details, stage):
+    """Field sets the caller is likely to give next: the first one being asked for, or the whole group"""
+    if stage in ("confirming", "concluded"):
+        return []
+    missing = awaited_fields(details)
+    if not missing:
+        return []
+    candidates = [(missing[0],)]
+    if len(missing) > 1:
+        candidates.append(tuple(missing))
+    return candidates
+
+def fill(text, values):
+    """Put the caller's actual answers into a drafted reply; None if it names anything else"""
+    unknown = [field for field in PLACEHOLDER_RE.findall(text) if field not in values]
+    if unknown:
+        return None
+    return PLACEHOLDER_RE.sub(lambda match: values[match.group(1)], text)
+
+class Speculator:
+    """Drafts the agent's next reply while the caller is still answering.
+
+    After each agent turn, `draft` starts a reply for each likely answer (e.g.
+    "gave the guardian name") with placeholders where the answer's values go.
+    When the next turn's extraction shows the caller gave exactly one of those
+    field sets, `take` returns that draft with the values filled in and the
+    reply LLM call is skipped; every other draft is thrown away.
+
+    Each draft reserves an estimate of its cost when it starts (the average of
+    the drafts so far), and a draft that would take a call's spend plus
+    reservations past `max_tokens_per_call` isn't started. At most `max_running`
+    drafts run at once; the slot is taken when the draft is started, so a burst
+    of drafts can't overrun it, and a draft with no free slot is just skipped.
+    """
+    def __init__(self, max_tokens_per_call=3000, estimated_tokens=800, max_calls=10000, max_running=2):
+        self.max_tokens_per_call = max_tokens_per_call
+        self.max_running = max_running
+        self.running = 0
+        self.estimated_tokens = estimated_tokens
+        self.max_calls = max_calls
+        # call_sid -> {"drafts": {frozenset(fields): task}, "spent": tokens, "reserved": tokens}
+        self._calls = OrderedDict()
+        self._completed = 0
+        self.stats = {
+            "drafts": 0, "over_budget": 0, "busy": 0, "failed": 0, "discarded": 0,
+            "hits": 0, "misses": 0,
+            "tokens_spent": 0, "tokens_wasted": 0,
+            "latency_saved_seconds": 0.0
+        }
+
+    def pending(self, call_sid):
+        entry = self._calls.get(call_sid)
+        return bool(entry and entry["drafts"])
+
+    def estimate(self):
+        if not self._completed:
+            return self.estimated_tokens
+        return self.stats["tokens_spent"] // self._completed
+
+    def begin(self, call_sid):
+        """Start a new round of drafts; whatever is left from the last one is wasted"""
+        entry = self._calls.get(call_sid)
+        if entry and entry["drafts"]:
+            drafts, entry["drafts"] = entry["drafts"], {}
+            self._discard(drafts.values())
+
+    def draft(self, call_sid, fields, make):
+        """Start drafting the reply for the caller giving `fields`; `make` returns a (text, usage) coroutine"""
+        entry = self._calls.get(call_sid)
+        if entry is None:
+            entry = self._calls[call_sid] = {"drafts": {}, "spent": 0, "reserved": 0}
+            while len(self._calls) > self.max_calls:
+                _, evicted = self._calls.popitem(last=False)
+                self._discard(evicted["drafts"].values())
+        self._calls.move_to_end(call_sid)
+
+        if self.running >= self.max_running:
+            self.stats["busy"] += 1
+            return
+        estimate = self.estimate()
+        if entry["spent"] + entry["reserved"] + estimate > self.max_tokens_per_call:
+            self.stats["over_budget"] += 1
+            return
+        self.stats["drafts"] += 1
+        self.running += 1
+        entry["reserved"] += estimate
+        key = frozenset(fields)
+        superseded = entry["drafts"].get(key)
+        if superseded is not None:
+            self._discard([superseded])
+        entry["drafts"][key] = asyncio.ensure_future(self._run(entry, make, estimate))
+
+    async def _run(self, entry, make, estimate):
+        started = time.perf_counter()
+        try:
+            text, usage = await make()
+        except Exception as e:
+            print(f"Speculative draft failed: {e}")
+            self.stats["failed"] += 1
+            return None
+        finally:
+            self.running -= 1
+            entry["reserved"] -= estimate
+        tokens = usage.get("total_tokens", 0)
+        entry["spent"] += tokens
+        self._completed += 1
+        self.stats["tokens_spent"] += tokens
+        return text, time.perf_counter() - started, tokens
+
+    async def take(self, call_sid, given):
+        """The draft matching the fields the caller just gave ({field: value}), or None"""
+        entry = self._calls.get(call_sid)
+        if entry is None or not entry["drafts"]:
+            return None
+        drafts, entry["drafts"] = entry["drafts"], {}
+        task = drafts.pop(frozenset(given), None)
+        self._discard(drafts.values())
+        if task is None:
+            self.stats["misses"] += 1
+            return None
+
+        # An unfinished draft is still further along than a reply started now
+        waited = time.perf_counter()
+        result = await asyncio.shield(task)
+        waited = time.perf_counter() - waited
+        text = fill(result[0], given) if result else None
+        if text is None:
+            self.stats["misses"] += 1
+            if result:
+                self.stats["tokens_wasted"] += result[2]
+            return None
+        self.stats["hits"] += 1
+        self.stats["latency_saved_seconds"] += max(result[1] - waited, 0.0)
+        return text
+
+    def discard(self, call_sid):
+        entry = self._calls.get(call_sid)
+        if entry and entry["drafts"]:
+            self.stats["misses"] += 1
+            drafts, entry["drafts"] = entry["drafts"], {}
+            self._discard(drafts.values())
+
+    def finish(self, call_sid):
+        entry = self._calls.pop(call_sid, None)
+        if entry:
+            self._discard(entry["drafts"].values())
+
+    def _discard(self, tasks):
+        # The LLM call can't be taken back, so just count what it cost once it's done
+        for task in tasks:
+            self.stats["discarded"] += 1
+            task.add_done_callback(self._wasted)
+
+    def _wasted(self, task):
+        if task.cancelled():
+            # Cut off part way; charge what a draft usually costs
+            self.stats["tokens_wasted"] += self.estimate()
+            return
+        result = task.result()
+        if result:
+            self.stats["tokens_wasted"] += result[2]
+
+    def summary(self):
+        stats = dict(self.stats)
+        taken = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / taken, 3) if taken else 0.0
+        stats["avg_latency_saved_ms"] = round(stats["latency_saved_seconds"] / stats["hits"] * 1000, 2) if stats["hits"] else None
+        stats["latency_saved_seconds"] = round(stats["latency_saved_seconds"], 3)
+        return stats
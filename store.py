@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+def _to_json(value):
+    # Record parts that aren't plain JSON (e.g. the transcript) know how to serialise themselves
+    if hasattr(value, "to_json"):
+        return value.to_json()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class NullBackend:
+    """Durable tier that keeps nothing; evicted and finished calls are simply dropped"""
+    blocking = False
+
+    def load(self, call_sid):
+        return None
+
+    def save(self, call_sid, record, finished=False):
+        pass
+
+    def update(self, call_sid, record):
+        pass
+
+class SQLiteBackend:
+    """Durable tier storing one JSON row per call in a local SQLite file"""
+    # Every call may wait on disk or on another process's write lock
+    blocking = True
+
+    def __init__(self, path):
+        # Other worker processes may hold the write lock briefly; wait for them
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS calls (
+                    call_sid TEXT PRIMARY KEY,
+                    record TEXT NOT NULL,
+                    finished INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS call_locks (
+                    call_sid TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+    def load(self, call_sid):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM calls WHERE call_sid = ?", (call_sid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, call_sid, record, finished=False):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO calls (call_sid, record, finished, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(call_sid) DO UPDATE SET
+                    record = excluded.record, finished = excluded.finished, updated_at = excluded.updated_at
+                """,
+                (call_sid, json.dumps(record, separators=(",", ":"), default=_to_json), int(finished), time.time())
+            )
+            self._conn.commit()
+
+    def update(self, call_sid, record):
+        """Rewrite a stored call's record, leaving it finished or not as it was"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE calls SET record = ?, updated_at = ? WHERE call_sid = ?",
+                (json.dumps(record, separators=(",", ":"), default=_to_json), time.time(), call_sid)
+            )
+            self._conn.commit()
+
+    def try_lease(self, call_sid, owner, lease_seconds):
+        """Take the lease on a call unless another live owner holds it"""
+        now = time.time()
+        with self._lock:
+            # Both statements run in one transaction, so other processes see either
+            # the old lease or ours, never a gap between them
+            self._conn.execute("DELETE FROM call_locks WHERE call_sid = ? AND (expires_at < ? OR owner = ?)", (call_sid, now, owner))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO call_locks (call_sid, owner, expires_at) VALUES (?, ?, ?)",
+                (call_sid, owner, now + lease_seconds)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def release_lease(self, call_sid, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM call_locks WHERE call_sid = ? AND owner = ?", (call_sid, owner))
+            self._conn.commit()
+
+class ConversationStore:
+    """Per-call records kept in a bounded LRU/TTL cache in front of a durable backend.
+
+    Live calls stay in memory. Finished calls, and live calls pushed out by the
+    size or idle limits, are written to the backend and can be read back from it.
+    """
+    def __init__(self, backend, max_live=10000, ttl_seconds=2 * 60 * 60):
+        self.backend = backend
+        # Puts can spill to the backend and misses read from it; locks stay in-process
+        self.blocking = backend.blocking
+        self.shared = False
+        self.max_live = max_live
+        self.ttl_seconds = ttl_seconds
+        self._live = OrderedDict()
+        self._touched = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, call_sid):
+        return self.get(call_sid) is not None
+
+    def put(self, call_sid, record):
+        with self._lock:
+            self._cache(call_sid, record)
+            spilled = self._evict()
+        self._spill(spilled)
+
+    def get(self, call_sid):
+        """Record for a live call, reloading it from the backend if it was spilled"""
+        with self._lock:
+            record = self._live.get(call_sid)
+            if record is not None:
+                self._cache(call_sid, record)
+                return record
+        record = self.backend.load(call_sid)
+        if record is not None:
+            self.put(call_sid, record)
+        return record
+
+    def save(self, call_sid, record):
+        # Cached records are changed in place, so saving only marks the call as recently used
+        self.put(call_sid, record)
+
+    def peek(self, call_sid):
+        """Read-only lookup that doesn't pull finished calls back into the cache"""
+        with self._lock:
+            record = self._live.get(call_sid)
+        return record if record is not None else self.backend.load(call_sid)
+
+    def update(self, call_sid, record):
+        """Write back a record read with peek; one that isn't cached is written to the backend and stays out"""
+        with self._lock:
+            live = call_sid in self._live
+            if live:
+                self._cache(call_sid, record)
+        if not live:
+            self.backend.update(call_sid, record)
+
+    def is_live(self, call_sid):
+        """Whether the call's record is in memory, without reading the backend"""
+        with self._lock:
+            return call_sid in self._live
+
+    def try_lock(self, call_sid, owner):
+        with self._lock:
+            if self._owners.get(call_sid, owner) != owner:
+                return False
+            self._owners[call_sid] = owner
+            return True
+
+    def unlock(self, call_sid, owner):
+        with self._lock:
+            if self._owners.get(call_sid) == owner:
+                del self._owners[call_sid]
+
+    def finish(self, call_sid):
+        with self._lock:
+            record = self._live.pop(call_sid, None)
+            self._touched.pop(call_sid, None)
+        if record is not None:
+            self.backend.save(call_sid, record, finished=True)
+
+    def _cache(self, call_sid, record):
+        self._live[call_sid] = record
+        self._live.move_to_end(call_sid)
+        self._touched[call_sid] = time.monotonic()
+
+    def _evict(self):
+        spilled = []
+        now = time.monotonic()
+        # Least recently touched calls sit at the front
+        while self._live:
+            call_sid = next(iter(self._live))
+            if len(self._live) <= self.max_live and now - self._touched[call_sid] < self.ttl_seconds:
+                break
+            spilled.append((call_sid, self._live.pop(call_sid)))
+            self._touched.pop(call_sid)
+        return spilled
+
+    def _spill(self, spilled):
+        for call_sid, record in spilled:
+            self.backend.save(call_sid, record)
+
+class SharedConversationStore:
+    """Call records kept only in a SQLite file shared by every worker process.
+
+    Nothing is cached in-process: each read goes to the file and each change is
+    written back, so a follow-up webhook can land on any worker. Per-call leases
+    stop two workers from interleaving their updates to the same call.
+
+    What the webhooks need goes through the file: the transcript and details,
+    answered deliveries (so a retry on another worker is replayed, not re-run),
+    the rest of a streamed reply for /voice-continue, and call statuses. What
+    stays in each worker: dashboard events are pushed only by the worker that
+    ran the turn (other workers' streams pick changes up from the file every
+    EVENT_KEEPALIVE_SECONDS), speculative drafts only help turns that land on
+    the worker that drafted them, campaigns are tracked by the worker that
+    created them, and the stats endpoints report one worker each.
+    """
+    def __init__(self, backend, lease_seconds=120):
+        self.backend = backend
+        self.blocking = True
+        self.shared = True
+        self.lease_seconds = lease_seconds
+
+    def __contains__(self, call_sid):
+        return self.get(call_sid) is not None
+
+    def put(self, call_sid, record):
+        self.backend.save(call_sid, record)
+
+    def save(self, call_sid, record):
+        self.backend.save(call_sid, record)
+
+    def get(self, call_sid):
+        return self.backend.load(call_sid)
+
+    def peek(self, call_sid):
+        return self.backend.load(call_sid)
+
+    def update(self, call_sid, record):
+        self.backend.update(call_sid, record)
+
+    def is_live(self, call_sid):
+        return False
+
+    def finish(self, call_sid):
+        record = self.backend.load(call_sid)
+        if record is not None:
+            self.backend.save(call_sid, record, finished=True)
+
+    def try_lock(self, call_sid, owner):
+        return self.backend.try_lease(call_sid, owner, self.lease_seconds)
+
+    def unlock(self, call_sid, owner):
+        self.backend.release_lease(call_sid, owner)
+
+def shared_store_configured():
+    """Whether CONVERSATION_STORE asks for the store every worker process shares"""
+    return os.getenv("CONVERSATION_STORE", "sqlite") == "shared"
+
+def create_store():
+    backend_name = os.getenv("CONVERSATION_STORE", "sqlite")
+    if backend_name == "shared":
+        # For running several uvicorn workers against one call-state file
+        return SharedConversationStore(
+            SQLiteBackend(os.getenv("CONVERSATION_DB", "conversations.db")),
+            lease_seconds=float(os.getenv("CALL_LEASE_SECONDS", "120"))
+        )
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(os.getenv("CONVERSATION_DB", "conversations.db"))
+    else:
+        backend = NullBackend()
+    return ConversationStore(
+        backend,
+        max_live=int(os.getenv("LIVE_CALL_CACHE_SIZE", "10000")),
+        ttl_seconds=float(os.getenv("LIVE_CALL_TTL_SECONDS", "7200"))
+    )
@@ -0,0 +1,43 @@
+import re
+from completions import openai_client, usage_of
+
+# A sentence ends at . ! or ? followed by whitespace; the rest may still be streaming
+SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+def split_first_sentence(text):
+    """Split off the first complete sentence, returning ("", text) if there isn't one yet"""
+    match = SENTENCE_END.search(text)
+    if not match:
+        return "", text
+    return text[:match.end()].strip(), text[match.end():].strip()
+
+async def stream_reply(messages, model, temperature, on_first_sentence):
+    """Stream a chat completion, calling on_first_sentence as soon as one is complete.
+
+    Returns the full reply text and its token usage.
+    """
+    stream = await openai_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+
+    parts = []
+    usage = {}
+    flushed = False
+    async for chunk in stream:
+        if chunk.usage:
+            usage = usage_of(chunk.usage)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+
+        parts.append(chunk.choices[0].delta.content)
+        if not flushed:
+            first_sentence, _ = split_first_sentence("".join(parts))
+            if first_sentence:
+                on_first_sentence(first_sentence)
+                flushed = True
+
+    return "".join(parts).strip(), usage
@@ -1,7 +1,9 @@
-from crewai import Task
-from agents import vet_appointment_agent, data_extraction_agent
+# Task prompts as plain dicts; completions.build_messages fills in the {placeholders}
+# and sends them with the agent's role to the model. Extraction requests also carry
+# schemas.EXTRACTION_RESPONSE_FORMAT, so the API holds the output to the JSON shape
+# below; the manager still validates the values
 
-confirmation_task = Task(
+CONFIRMATION_TASK = dict(
     description="""You are a friendly veterinary appointment coordinator. Based on what information has already been collected, decide what to ask next.
 
 DETAILS ALREADY COLLECTED:
@@ -23,15 +25,18 @@ Follow this decision logic:
 
 IMPORTANT: When confirming, explicitly state that the appointment is confirmed to trigger the confirmation flag.
 
+If the stage is already "confirming" when the call starts, the clinic had these details on file: greet the caller,
+read the details back and ask them to confirm. If they correct something, confirm the corrected value and don't ask
+again for anything they haven't disputed.
+
 Be natural, friendly, and conversational. Use the person's and pet's names when you know them.
 Only ask for information that's missing. Don't repeat questions for information already provided.
 
 Your response should be a single, friendly, conversational sentence or question.""",
-    expected_output="A natural, friendly conversational response that moves the appointment confirmation forward.",
-    agent=vet_appointment_agent
+    expected_output="A natural, friendly conversational response that moves the appointment confirmation forward."
 )
 
-data_extraction_task = Task(
+DATA_EXTRACTION_TASK = dict(
     description="""Analyze the conversation carefully and extract ONLY the specific information mentioned. Be very precise.
 
 CONVERSATION HISTORY:
@@ -77,6 +82,55 @@ Return ONLY a valid JSON object with this exact structure:
   },
   "conversation_stage": "stage_name"
 }""",
-    expected_output="A valid JSON object with accurately extracted details and conversation stage",
-    agent=data_extraction_agent
-)
\ No newline at end of file
+    expected_output="A valid JSON object with accurately extracted details and conversation stage"
+)
+
+INCREMENTAL_EXTRACTION_TASK = dict(
+    description="""Update the details of a veterinary appointment call using ONLY the newest turns of the conversation.
+
+DETAILS COLLECTED SO FAR (JSON, missing fields have not been collected yet):
+{current_details}
+
+NEW TURNS SINCE THE LAST UPDATE:
+{new_turns}
+
+Extract ONLY the following information if explicitly mentioned in the NEW TURNS:
+- guardian_name: ONLY the human's name (not pet name)
+- pet_name: ONLY the pet's name (not human name)  
+- pet_species: ONLY the animal type (dog, cat, etc.)
+- pet_breed: ONLY the specific breed name
+- pet_dob: ONLY the date of birth or age
+- appointment_date: ONLY the appointment date
+- appointment_time: ONLY the appointment time
+
+CRITICAL RULES:
+1. guardian_name and pet_name MUST be different. If they're the same, you made an error.
+2. pet_species should be simple: "dog", "cat", "bird", etc.
+3. pet_breed should be the specific breed: "German Shepherd", "Bengal", "Golden Retriever", etc.
+4. If someone says "it's a dog" - species is "dog", breed is empty until specified.
+5. If someone says "German Shepherd" - species is "dog", breed is "German Shepherd".
+6. Leave a field empty if the NEW TURNS don't mention it. Only fill an already collected field if the customer corrects it.
+
+Determine the current conversation stage, taking both the details collected so far and the new turns into account, from:
+- greeting: Just started, no details collected
+- collecting_guardian: Getting guardian name
+- collecting_pet_details: Getting pet information  
+- collecting_appointment: Getting appointment details
+- confirming: Confirming all details
+- concluded: All details confirmed, ready to end call
+
+Return ONLY a valid JSON object with this exact structure:
+{
+  "extracted_details": {
+    "guardian_name": "value or empty",
+    "pet_name": "value or empty", 
+    "pet_species": "value or empty",
+    "pet_breed": "value or empty",
+    "pet_dob": "value or empty",
+    "appointment_date": "value or empty",
+    "appointment_time": "value or empty"
+  },
+  "conversation_stage": "stage_name"
+}""",
+    expected_output="A valid JSON object with the details mentioned in the new turns and the conversation stage"
+)
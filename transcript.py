@@ -0,0 +1,75 @@
+class Message:
+    """One transcript entry; slots keep the per-message overhead down on long calls"""
+    __slots__ = ("role", "content")
+
+    def __init__(self, role, content):
+        self.role = role
+        self.content = content
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content}
+
+class Transcript:
+    """Append-only call transcript that keeps each message's rendered "role: content" line.
+
+    Appends render the new line and add it to the end of the rendered context,
+    so reading the context never rebuilds it however long the call gets; the
+    turns since a given index, the last message from either side and
+    each side's messages are all read without rescanning the call. Serialises to
+    the same list of {"role", "content"} dicts the store has always held.
+    """
+    __slots__ = ("_messages", "_lines", "_context", "_last", "_by_role")
+
+    def __init__(self, messages=()):
+        self._messages = []
+        self._lines = []
+        self._context = ""
+        self._last = {}
+        self._by_role = {}
+        for msg in messages:
+            self.append(msg["role"], msg["content"])
+
+    def append(self, role, content):
+        line = f"{role}: {content}"
+        # Dropping the attribute's reference first leaves the local string the
+        # only one, so CPython grows it in place instead of copying the context
+        context, self._context = self._context, None
+        if context:
+            context += "\n" + line
+        else:
+            context = line
+        self._context = context
+        self._lines.append(line)
+        self._last[role] = len(self._messages)
+        self._by_role.setdefault(role, []).append(content)
+        self._messages.append(Message(role, content))
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def context(self):
+        return self._context
+
+    def context_since(self, index):
+        """Rendered lines for the messages from `index` on"""
+        return "\n".join(self._lines[index:])
+
+    def messages(self, start=0, end=None):
+        return self._messages[start:end]
+
+    def last(self, role):
+        index = self._last.get(role)
+        return self._messages[index].content if index is not None else ""
+
+    def count(self, role):
+        return len(self._by_role.get(role, ()))
+
+    def contents(self, role):
+        return list(self._by_role.get(role, ()))
+
+    def to_list(self):
+        return [msg.to_dict() for msg in self._messages]
+
+    def to_json(self):
+        return self.to_list()
@@ -0,0 +1,89 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when a pool already has as many jobs running and queued as it allows"""
+
+class BlockingPool:
+    """Bounded thread pool for running blocking calls (Twilio REST, SQLite) from async handlers"""
+    def __init__(self, name, max_workers, queue_depth):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, fn, *args, **kwargs):
+        # Only touched from the event loop thread, so the counter needs no lock
+        if self.pending >= self.max_workers + self.queue_depth:
+            raise PoolSaturatedError(f"{self.name} pool is full ({self.pending} jobs pending)")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class AsyncPool:
+    """The same bounds as BlockingPool for coroutines, e.g. requests on an async client"""
+    def __init__(self, name, max_workers, queue_depth):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.pending = 0
+        self._loop = None
+        self._running = None
+
+    async def run(self, fn, *args, **kwargs):
+        if self.pending >= self.max_workers + self.queue_depth:
+            raise PoolSaturatedError(f"{self.name} pool is full ({self.pending} jobs pending)")
+
+        self.pending += 1
+        try:
+            async with self._slots():
+                return await fn(*args, **kwargs)
+        finally:
+            self.pending -= 1
+
+    def _slots(self):
+        # asyncio primitives belong to one event loop; make a new one per loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._running = asyncio.Semaphore(self.max_workers)
+        return self._running
+
+# Pool sizes and queue depths can be tuned per deployment. LLM requests go
+# through the async OpenAI client, so the LLM "pool" bounds requests in flight
+# rather than threads
+llm_pool = AsyncPool(
+    "llm",
+    max_workers=int(os.getenv("LLM_POOL_SIZE", "16")),
+    queue_depth=int(os.getenv("LLM_QUEUE_DEPTH", "64"))
+)
+
+twilio_pool = BlockingPool(
+    "twilio",
+    max_workers=int(os.getenv("TWILIO_POOL_SIZE", "8")),
+    queue_depth=int(os.getenv("TWILIO_QUEUE_DEPTH", "32"))
+)
+
+# Call-state reads and writes when the store is backed by SQLite, so disk I/O
+# and lease polling never run on the event loop
+store_pool = BlockingPool(
+    "store",
+    max_workers=int(os.getenv("STORE_POOL_SIZE", "8")),
+    queue_depth=int(os.getenv("STORE_QUEUE_DEPTH", "256"))
+)
+
+tts_pool = BlockingPool(
+    "tts",
+    max_workers=int(os.getenv("TTS_POOL_SIZE", "2")),
+    queue_depth=int(os.getenv("TTS_QUEUE_DEPTH", "16"))
+)